@@ -7,11 +7,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import sys
 import os
+import io
+import hashlib
+import importlib.util
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
@@ -23,10 +24,139 @@ try:
     from data_processor import WeatherDataProcessor
     from visualizer import WeatherVisualizer
     from ai_analyzer import WeatherAIAnalyzer
+    from downsampling import downsample, binned_histogram
+    from aggregates import AggregateCube
+    from date_index import DateIndex
+    from profiling import PerformanceMonitor
+    from shared_store import SharedDatasetStore
+    from table_view import PAGE_SIZES, EXPORT_FORMATS, page_count, page_slice, sort_order, is_presorted, export_bytes
 except ImportError as e:
     st.error(f"模块导入错误: {e}")
     st.info("请确保所有必要的模块都已正确安装和配置")
 
+# 数据缓存配置（可通过环境变量调整）
+CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "3600"))  # 缓存有效期（秒）
+CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "8"))  # 最多缓存的数据集个数
+SAMPLE_START_DATE = '2023-01-01'
+SAMPLE_END_DATE = '2023-12-31'
+STORAGE_FORMAT = os.getenv("WEATHER_STORAGE_FORMAT", "csv")  # 数据落盘格式: csv / parquet / feather
+UPLOAD_CHUNK_SIZE = int(os.getenv("WEATHER_UPLOAD_CHUNK_SIZE", "200000"))  # 上传文件分块清洗的行数
+MODEL_DIR = os.getenv("WEATHER_MODEL_DIR") or None  # 异常检测模型的持久化目录
+CHART_MAX_POINTS = int(os.getenv("WEATHER_CHART_MAX_POINTS", "2000"))  # 每条时间序列曲线的点数预算
+COMPACT_MODE = os.getenv("WEATHER_COMPACT_MODE") or None  # 紧凑数据模式: float32 / int16
+SHARED_DIR = os.getenv("WEATHER_SHARED_DIR") or None  # 共享数据集的 Arrow 文件目录，默认为临时目录
+# 性能监控：设置后记录各阶段耗时并在侧边栏显示性能页面（也可在地址后加 ?perf=1 临时打开）
+PROFILING = os.getenv("WEATHER_PROFILING", "").lower() in ("1", "true", "yes")
+PROFILE_MEMORY = os.getenv("WEATHER_PROFILE_MEMORY", "").lower() in ("1", "true", "yes")
+PROFILE_PATH = os.getenv("WEATHER_PROFILE_PATH", os.path.join("results", "perf_metrics.jsonl"))
+PERF_PAGE = "⏱️ 性能监控"
+PROCESSOR_STAGES = ['generate_sample_data', 'clean_data', 'to_compact', 'memory_report']
+ANALYZER_STAGES = ['detect_anomalies', 'generate_insights_report', 'predict_future_weather']
+VISUALIZER_STAGES = ['plot_temperature_trend', 'plot_seasonal_comparison', 'plot_correlation_heatmap',
+                     'plot_weather_patterns', 'create_interactive_dashboard']
+PAGE_STAGES = ['show_data_overview', 'show_data_table', 'show_data_export', 'show_visualization_analysis',
+               'show_temperature_trend', 'show_seasonal_comparison', 'show_correlation_analysis', 'show_weather_patterns',
+               'show_interactive_dashboard', 'show_ai_analysis', 'show_anomaly_detection', 'show_ai_report',
+               'show_prediction_analysis', 'show_project_info']
+
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def get_sort_order(data_key, filter_key, column, ascending, _values):
+    """
+    每个数据集、筛选条件和排序列只计算一次的排序位置（_values 不参与哈希计算）。
+    数据已按该列有序时返回 None，分页直接切片。
+    """
+    if is_presorted(_values, ascending):
+        return None
+    return sort_order(_values, ascending)
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def get_summary_statistics(data_key, filter_key, _data):
+    """按数据集和筛选条件缓存的统计摘要（_data 不参与哈希计算）"""
+    return _data[['temperature', 'humidity', 'precipitation', 'wind_speed']].describe()
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def get_memory_report(data_key, _processor, _data):
+    """按数据集缓存的内存占用报告（逐列 deep memory_usage，开销随数据量增长）"""
+    return _processor.memory_report(_data)
+
+
+@st.cache_resource(show_spinner=False)
+def get_performance_monitor():
+    """进程内共享的性能监控器，汇总所有会话的各阶段耗时"""
+    return PerformanceMonitor(enabled=PROFILING, track_memory=PROFILE_MEMORY)
+
+
+@st.cache_resource(show_spinner=False)
+def get_dataset_store():
+    """进程内共享的只读数据集注册表：所有会话使用同一份内存映射的数据集，各自只保存筛选状态"""
+    return SharedDatasetStore(SHARED_DIR, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+
+
+def dataset_key(kind, *parts):
+    """
+    数据集标识。包含紧凑模式和存储格式：指定 WEATHER_SHARED_DIR 时文件按标识复用，
+    换用不同设置重启后不会映射到类型不同的旧文件
+    """
+    return ":".join([kind, *map(str, parts), f"compact={COMPACT_MODE or 'none'}", f"storage={STORAGE_FORMAT}"])
+
+
+def sample_data_key(start_date=SAMPLE_START_DATE, end_date=SAMPLE_END_DATE):
+    """示例数据集的标识"""
+    return dataset_key('sample', start_date, end_date)
+
+
+def load_sample_dataset(start_date=SAMPLE_START_DATE, end_date=SAMPLE_END_DATE):
+    """生成并清洗示例数据（按生成参数在所有会话间共享，命中时不重新计算也不写盘）"""
+    def build():
+        processor = WeatherDataProcessor(storage_format=STORAGE_FORMAT, compact=COMPACT_MODE)
+        get_performance_monitor().instrument(processor, PROCESSOR_STAGES, 'processor')
+        raw_data = processor.generate_sample_data(start_date=start_date, end_date=end_date)
+        return processor.clean_data(raw_data)
+    return get_dataset_store().get_or_create(sample_data_key(start_date, end_date), build)
+
+
+def load_uploaded_dataset(content_hash, content):
+    """解析并分块清洗上传的CSV数据（按文件内容哈希在所有会话间共享）"""
+    header = pd.read_csv(io.BytesIO(content), nrows=0)
+    if 'date' not in header.columns:
+        return header
+
+    def build():
+        processor = WeatherDataProcessor(compact=COMPACT_MODE)
+        get_performance_monitor().instrument(processor, PROCESSOR_STAGES, 'processor')
+        with get_performance_monitor().stage('processor.iter_clean_chunks'):
+            chunks = list(processor.iter_clean_chunks(io.BytesIO(content), chunksize=UPLOAD_CHUNK_SIZE))
+        if not chunks:
+            return header
+        data = pd.concat(chunks, ignore_index=True)
+        return processor.to_compact(data, inplace=True) if COMPACT_MODE else data
+    return get_dataset_store().get_or_create(dataset_key('upload', content_hash), build)
+
+
+@st.cache_resource(show_spinner=False)
+def get_ai_analyzer():
+    """进程内共享的AI分析器，使已训练的异常检测模型在页面重跑之间得以复用"""
+    analyzer = WeatherAIAnalyzer(openai_api_key=os.getenv("OPENAI_API_KEY"), model_dir=MODEL_DIR)
+    return get_performance_monitor().instrument(analyzer, ANALYZER_STAGES, 'analyzer')
+
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def get_aggregate_cube(data_key, _data):
+    """每个数据集只构建一次的预聚合立方体（按数据集标识缓存，_data 不参与哈希计算）"""
+    with get_performance_monitor().stage('app.build_aggregate_cube'):
+        return AggregateCube.build(_data)
+
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def get_date_index(data_key, _data):
+    """每个数据集只构建一次的日期/季节筛选索引（按数据集标识缓存，_data 不参与哈希计算）"""
+    with get_performance_monitor().stage('app.build_date_index'):
+        return DateIndex.build(_data)
+
+
 # 页面配置
 st.set_page_config(
     page_title="智能气象数据分析平台",
@@ -77,30 +207,50 @@ class WeatherApp:
         self.visualizer = None
         self.ai_analyzer = None
         self.data = None
+        self.data_key = None
+        self.data_loaded = False
         self.filtered_data = None
+        self.filter_key = None
+        self.date_filter_full = True
+        self.selected_seasons = None
+        self.monitor = get_performance_monitor()
+        self.show_perf_page = PROFILING or st.session_state.get('profiling', False)
         
         # 初始化组件
         try:
-            self.processor = WeatherDataProcessor()
+            self.processor = WeatherDataProcessor(storage_format=STORAGE_FORMAT, compact=COMPACT_MODE)
             self.visualizer = WeatherVisualizer()
-            self.ai_analyzer = WeatherAIAnalyzer()
+            self.ai_analyzer = get_ai_analyzer()
+            self.monitor.instrument(self.processor, PROCESSOR_STAGES, 'processor')
+            self.monitor.instrument(self.visualizer, VISUALIZER_STAGES, 'visualizer')
+            self.monitor.instrument(self, PAGE_STAGES, 'page')
         except Exception as e:
             st.error(f"组件初始化失败: {e}")
     
     def load_data(self):
-        """加载或生成数据，并支持上传自定义数据"""
+        """加载或生成数据，并支持上传自定义数据（每次页面运行只加载一次）"""
+        if self.data_loaded:
+            return self.data
+        self.data_loaded = True
+        with self.monitor.stage('app.load_data'):
+            return self._load_data()
+    
+    def _load_data(self):
+        """load_data 的实际加载逻辑"""
         # 优先检查用户是否上传了自己的CSV数据
         uploaded_file = st.sidebar.file_uploader("上传你的CSV数据文件", type="csv")
         if uploaded_file is not None:
             try:
-                # 尝试读取上传的CSV数据
-                data = pd.read_csv(uploaded_file)
+                # 尝试读取上传的CSV数据（相同内容的文件只解析一次）
+                content = uploaded_file.getvalue()
+                content_hash = hashlib.sha256(content).hexdigest()
+                data = load_uploaded_dataset(content_hash, content)
                 # 请确保CSV中包含 'date' 列，并转换为datetime格式
                 if 'date' not in data.columns:
                     st.error("上传的数据中未找到 'date' 列，请检查数据格式。")
                 else:
-                    data['date'] = pd.to_datetime(data['date'], errors='coerce')
                     self.data = data
+                    self.data_key = dataset_key('upload', content_hash)
                     st.success("自定义数据加载成功！")
             except Exception as e:
                 st.error(f"自定义数据加载失败: {e}")
@@ -115,9 +265,9 @@ class WeatherApp:
                         st.error("数据处理器未初始化")
                         return None
                     
-                    # 生成示例数据，并进行数据清洗预处理
-                    raw_data = self.processor.generate_sample_data()
-                    self.data = self.processor.clean_data(raw_data)
+                    # 生成示例数据，并进行数据清洗预处理（结果按生成参数缓存）
+                    self.data = load_sample_dataset(SAMPLE_START_DATE, SAMPLE_END_DATE)
+                    self.data_key = sample_data_key(SAMPLE_START_DATE, SAMPLE_END_DATE)
                     st.success("示例数据加载成功！")
                 except Exception as e:
                     st.error(f"数据加载失败: {e}")
@@ -128,11 +278,11 @@ class WeatherApp:
         """显示侧边栏"""
         st.sidebar.markdown("## 🌤️ 导航菜单")
         
-        # 页面选择
-        page = st.sidebar.selectbox(
-            "选择页面",
-            ["📊 数据概览", "📈 可视化分析", "🤖 AI智能分析", "ℹ️ 项目介绍"]
-        )
+        # 页面选择（性能监控页面默认隐藏）
+        pages = ["📊 数据概览", "📈 可视化分析", "🤖 AI智能分析", "ℹ️ 项目介绍"]
+        if self.show_perf_page:
+            pages.append(PERF_PAGE)
+        page = st.sidebar.selectbox("选择页面", pages)
         
         st.sidebar.markdown("---")
         
@@ -141,46 +291,65 @@ class WeatherApp:
         
         if st.sidebar.button("🔄 重新生成示例数据"):
             self.data = None
+            get_dataset_store().evict(sample_data_key(SAMPLE_START_DATE, SAMPLE_END_DATE))
             # 兼容处理：检查是否存在 experimental_rerun，如果不存在则提示用户手动刷新
             if hasattr(st, "experimental_rerun"):
                 st.experimental_rerun()
             else:
                 st.info("请手动刷新页面以重新生成示例数据。")
         
-        # 数据筛选
-        if self.data is not None:
+        # 数据筛选（先加载数据，筛选控件才能按数据范围显示）
+        self.load_data()
+        if self.data is not None and len(self.data) > 0:
             st.sidebar.markdown("### 🔍 数据筛选")
+            index = get_date_index(self.data_key, self.data)
             
             # 日期范围选择
             date_range = st.sidebar.date_input(
                 "选择日期范围",
-                value=(self.data['date'].min().date(), self.data['date'].max().date()),
-                min_value=self.data['date'].min().date(),
-                max_value=self.data['date'].max().date()
+                value=(index.min_date, index.max_date),
+                min_value=index.min_date,
+                max_value=index.max_date
             )
             
-            # 季节选择
+            # 季节选择（取值来自季节分类，无需扫描数据）
+            season_options = index.categories
             seasons = st.sidebar.multiselect(
                 "选择季节",
-                options=self.data['season'].unique(),
-                default=self.data['season'].unique()
+                options=season_options,
+                default=season_options
             )
             
-            # 应用筛选
+            # 应用筛选：日期范围为二分查找切片，季节为按游程的编码查找
             if len(date_range) == 2 and seasons:
-                mask = (
-                    (self.data['date'].dt.date >= date_range[0]) &
-                    (self.data['date'].dt.date <= date_range[1]) &
-                    (self.data['season'].isin(seasons))
-                )
-                self.filtered_data = self.data[mask]
+                self.date_filter_full = (date_range[0] <= index.min_date and date_range[1] >= index.max_date)
+                self.selected_seasons = list(seasons)
+                self.filter_key = (str(date_range[0]), str(date_range[1]), tuple(seasons))
+                with self.monitor.stage('app.filter'):
+                    self.filtered_data = index.take(self.data, date_range[0], date_range[1], seasons)
             else:
                 self.filtered_data = self.data
         
         return page
     
+    def get_aggregate_cube(self):
+        """
+        获取当前数据集的预聚合立方体（已按所选季节筛选）。
+        日期范围筛选不是整月粒度，无法由立方体表达，此时返回 None，由调用方回退到扫描原始数据。
+        """
+        if self.data is None or self.data_key is None or not self.date_filter_full:
+            return None
+        if 'season' not in self.data.columns:
+            return None
+        cube = get_aggregate_cube(self.data_key, self.data)
+        if self.selected_seasons is not None:
+            cube = cube.filter(seasons=self.selected_seasons)
+        return cube
+    
     def show_data_overview(self):
         """显示数据概览页面"""
+        import plotly.express as px
+        
         st.markdown('<h1 class="main-header">📊 气象数据概览</h1>', unsafe_allow_html=True)
         
         data = self.load_data()
@@ -231,27 +400,23 @@ class WeatherApp:
         
         with col1:
             st.markdown('<h2 class="sub-header">📋 数据详情</h2>', unsafe_allow_html=True)
-            st.dataframe(
-                display_data.head(20),
-                use_container_width=True,
-                hide_index=True
-            )
-            
-            # 下载按钮
-            csv = display_data.to_csv(index=False)
-            st.download_button(
-                label="📥 下载数据 (CSV)",
-                data=csv,
-                file_name=f"weather_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+            self.show_data_table(display_data)
+            self.show_data_export(display_data)
         
         with col2:
             st.markdown('<h2 class="sub-header">📈 统计摘要</h2>', unsafe_allow_html=True)
-            stats = display_data[['temperature', 'humidity', 'precipitation', 'wind_speed']].describe()
+            stats = get_summary_statistics(self.data_key, self.filter_key, display_data)
             st.dataframe(stats, use_container_width=True)
+            memory = get_memory_report(self.data_key, self.processor, data)
+            shared = "，所有会话共享同一份内存映射数据" if get_dataset_store().memory_map else ""
+            st.caption(f"💾 内存占用 {memory['total_mb']} MB（全 float64/object 表示约 {memory['baseline_mb']} MB）{shared}")
             st.markdown("### 🍂 季节分布")
-            season_counts = display_data['season'].value_counts()
+            cube = self.get_aggregate_cube()
+            if cube is not None:
+                season_counts = cube.row_counts('season')
+                season_counts = season_counts[season_counts > 0]
+            else:
+                season_counts = display_data['season'].value_counts()
             fig_pie = px.pie(
                 values=season_counts.values,
                 names=season_counts.index,
@@ -259,6 +424,54 @@ class WeatherApp:
             )
             st.plotly_chart(fig_pie, use_container_width=True)
     
+    def show_data_table(self, data):
+        """分页、可排序的数据表格：排序位置按数据集和筛选条件缓存，每次只取出当前页的行"""
+        columns = list(data.columns)
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+        with col1:
+            sort_column = st.selectbox("排序列", columns, index=columns.index('date') if 'date' in columns else 0)
+        with col2:
+            ascending = st.selectbox("排序方向", ["升序", "降序"]) == "升序"
+        with col3:
+            page_size = st.selectbox("每页行数", PAGE_SIZES)
+        n_pages = page_count(len(data), page_size)
+        with col4:
+            page = st.number_input("页码", min_value=1, max_value=n_pages, value=1, step=1)
+        
+        order = get_sort_order(self.data_key, self.filter_key, sort_column, ascending, data[sort_column])
+        st.dataframe(
+            page_slice(data, int(page), page_size, order),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.caption(f"第 {int(page)} / {n_pages} 页，共 {len(data)} 行")
+    
+    def show_data_export(self, data):
+        """按需导出：点击后才按块生成压缩文件，文件在筛选条件或格式变化前保留在会话中"""
+        formats = [fmt for fmt in EXPORT_FORMATS
+                   if fmt != 'parquet' or importlib.util.find_spec('pyarrow') is not None]
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            fmt = st.selectbox("导出格式", formats, format_func=lambda fmt: EXPORT_FORMATS[fmt][0])
+        export_key = (self.data_key, self.filter_key, fmt)
+        with col2:
+            st.write("")
+            if st.button("📦 生成导出文件"):
+                with st.spinner("正在生成导出文件..."):
+                    st.session_state['data_export'] = (export_key, export_bytes(data, fmt))
+        
+        export = st.session_state.get('data_export')
+        if export is not None and export[0] == export_key:
+            label, mime = EXPORT_FORMATS[fmt]
+            size_kb = len(export[1]) / 1024
+            size = f"{size_kb / 1024:.1f} MB" if size_kb >= 1024 else f"{size_kb:.0f} KB"
+            st.download_button(
+                label=f"📥 下载数据 ({label}, {size})",
+                data=export[1],
+                file_name=f"weather_data_{datetime.now().strftime('%Y%m%d')}.{fmt}",
+                mime=mime
+            )
+    
     def show_visualization_analysis(self):
         """显示可视化分析页面"""
         st.markdown('<h1 class="main-header">📈 可视化分析</h1>', unsafe_allow_html=True)
@@ -285,36 +498,56 @@ class WeatherApp:
         elif chart_type == "交互式仪表板":
             self.show_interactive_dashboard(display_data)
     
+    def select_zoom_window(self, data, key):
+        """
+        数据点超过预算时提供时间窗口选择，缩小窗口后重新降采样即可看到更多细节
+        """
+        if len(data) <= CHART_MAX_POINTS:
+            return data
+        start, end = data['date'].min().to_pydatetime(), data['date'].max().to_pydatetime()
+        window = st.slider("缩放时间窗口", min_value=start, max_value=end, value=(start, end), key=key)
+        dates = data['date'].to_numpy()
+        lo = np.searchsorted(dates, np.datetime64(window[0]), side='left')
+        hi = np.searchsorted(dates, np.datetime64(window[1]), side='right')
+        return data.iloc[lo:hi]
+    
     def show_temperature_trend(self, data):
         """显示温度趋势图"""
+        import plotly.graph_objects as go
+        
         st.markdown('<h2 class="sub-header">🌡️ 温度趋势分析</h2>', unsafe_allow_html=True)
         
+        # 移动平均在完整数据上计算（清洗阶段已计算时直接复用），然后按点数预算降采样
+        ma_columns = [column for column in ('temp_ma7', 'temp_ma30') if column in data.columns]
+        data_copy = data[['date', 'temperature'] + ma_columns].copy()
+        for window in (7, 30):
+            if f'temp_ma{window}' not in data_copy.columns:
+                data_copy[f'temp_ma{window}'] = data_copy['temperature'].rolling(window=window).mean()
+        data_copy = self.select_zoom_window(data_copy, key="temperature_zoom")
+        plot_data = downsample(data_copy, 'date', 'temperature', CHART_MAX_POINTS)
+        
         fig = go.Figure()
         
         fig.add_trace(go.Scatter(
-            x=data['date'],
-            y=data['temperature'],
+            x=plot_data['date'],
+            y=plot_data['temperature'],
             mode='lines',
             name='日温度',
             line=dict(color='#1f77b4', width=1),
             opacity=0.7
         ))
         
-        data_copy = data.copy()
-        data_copy['temp_ma7'] = data_copy['temperature'].rolling(window=7).mean()
-        data_copy['temp_ma30'] = data_copy['temperature'].rolling(window=30).mean()
-        
         fig.add_trace(go.Scatter(
-            x=data_copy['date'],
-            y=data_copy['temp_ma7'],
+            x=plot_data['date'],
+            y=plot_data['temp_ma7'],
             mode='lines',
             name='7天移动平均',
             line=dict(color='#ff7f0e', width=2)
         ))
         
         fig.add_trace(go.Scatter(
-            x=data_copy['date'],
-            y=data_copy['temp_ma30'],
+            x=plot_data['date'],
+            y=plot_data['temp_ma30'],
             mode='lines',
             name='30天移动平均',
             line=dict(color='#2ca02c', width=3)
@@ -339,6 +572,8 @@ class WeatherApp:
     
     def show_seasonal_comparison(self, data):
         """显示季节对比分析"""
+        import plotly.express as px
+        
         st.markdown('<h2 class="sub-header">🍂 季节对比分析</h2>', unsafe_allow_html=True)
         
         variable = st.selectbox(
@@ -362,12 +597,18 @@ class WeatherApp:
         fig.update_layout(height=500)
         st.plotly_chart(fig, use_container_width=True)
         
-        seasonal_stats = data.groupby('season')[variable].agg(['mean', 'std', 'min', 'max']).round(2)
+        cube = self.get_aggregate_cube()
+        if cube is not None:
+            seasonal_stats = cube.rollup('season', variable)[['mean', 'std', 'min', 'max']].round(2)
+        else:
+            seasonal_stats = data.groupby('season', observed=True)[variable].agg(['mean', 'std', 'min', 'max']).round(2)
         seasonal_stats.columns = ['平均值', '标准差', '最小值', '最大值']
         st.dataframe(seasonal_stats, use_container_width=True)
     
     def show_correlation_analysis(self, data):
         """显示相关性分析"""
+        import plotly.express as px
+        
         st.markdown('<h2 class="sub-header">🔗 相关性分析</h2>', unsafe_allow_html=True)
         
         numeric_cols = ['temperature', 'humidity', 'precipitation', 'wind_speed']
@@ -396,6 +637,8 @@ class WeatherApp:
     
     def show_weather_patterns(self, data):
         """显示天气模式分析"""
+        import plotly.express as px
+        
         st.markdown('<h2 class="sub-header">🌦️ 天气模式分析</h2>', unsafe_allow_html=True)
         
         col1, col2 = st.columns(2)
@@ -414,7 +657,12 @@ class WeatherApp:
             st.plotly_chart(fig1, use_container_width=True)
         
         with col2:
-            monthly_temp = data.groupby(data['date'].dt.month)['temperature'].mean()
+            cube = self.get_aggregate_cube()
+            if cube is not None:
+                monthly_temp = cube.rollup('month', 'temperature')['mean']
+            else:
+                month = data['month'] if 'month' in data.columns else data['date'].dt.month
+                monthly_temp = data.groupby(month)['temperature'].mean()
             fig2 = px.line(
                 x=monthly_temp.index,
                 y=monthly_temp.values,
@@ -435,6 +683,9 @@ class WeatherApp:
     
     def show_interactive_dashboard(self, data):
         """显示交互式仪表板"""
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        
         st.markdown('<h2 class="sub-header">📊 交互式仪表板</h2>', unsafe_allow_html=True)
         
         fig = make_subplots(
@@ -444,20 +695,29 @@ class WeatherApp:
                    [{"secondary_y": False}, {"secondary_y": False}]]
         )
         
+        zoomed = self.select_zoom_window(data, key="dashboard_zoom")
+        temp_data = downsample(zoomed, 'date', 'temperature', CHART_MAX_POINTS)
+        wind_data = downsample(zoomed, 'date', 'wind_speed', CHART_MAX_POINTS, method='minmax')
+        humidity_centers, humidity_counts, humidity_widths = binned_histogram(data['humidity'])
+        
         fig.add_trace(
-            go.Scatter(x=data['date'], y=data['temperature'],
+            go.Scatter(x=temp_data['date'], y=temp_data['temperature'],
                        mode='lines', name='温度',
                        line=dict(color='#1f77b4', width=2)),
             row=1, col=1
         )
         
         fig.add_trace(
-            go.Histogram(x=data['humidity'], name='湿度分布',
-                         marker_color='#ff7f0e', opacity=0.7),
+            go.Bar(x=humidity_centers, y=humidity_counts, width=humidity_widths,
+                   name='湿度分布', marker_color='#ff7f0e', opacity=0.7),
             row=1, col=2
         )
         
-        seasonal_precip = data.groupby('season')['precipitation'].mean()
+        cube = self.get_aggregate_cube()
+        if cube is not None:
+            seasonal_precip = cube.rollup('season', 'precipitation')['mean']
+        else:
+            seasonal_precip = data.groupby('season', observed=True)['precipitation'].mean()
         fig.add_trace(
             go.Bar(x=seasonal_precip.index, y=seasonal_precip.values,
                    name='平均降水量', marker_color='#2ca02c'),
@@ -465,7 +725,7 @@ class WeatherApp:
         )
         
         fig.add_trace(
-            go.Scatter(x=data['date'], y=data['wind_speed'],
+            go.Scatter(x=wind_data['date'], y=wind_data['wind_speed'],
                        mode='markers', name='风速',
                        marker=dict(color='#d62728', size=4)),
             row=2, col=2
@@ -500,6 +760,8 @@ class WeatherApp:
     
     def show_anomaly_detection(self, data):
         """显示异常检测结果"""
+        import plotly.graph_objects as go
+        
         st.markdown('<h2 class="sub-header">🔍 异常天气检测</h2>', unsafe_allow_html=True)
         
         if self.ai_analyzer is None:
@@ -521,7 +783,7 @@ class WeatherApp:
         
         with st.spinner("AI正在分析异常天气..."):
             try:
-                anomalies_result = self.ai_analyzer.detect_anomalies(data)
+                anomalies_result = self.ai_analyzer.detect_anomalies(data, inplace=False)
                 if isinstance(anomalies_result, tuple):
                     anomalies, anomaly_info = anomalies_result
                 else:
@@ -607,10 +869,14 @@ class WeatherApp:
             st.info("请检查OpenAI API配置和模块依赖")
             return
         
+        use_openai = st.checkbox("使用大模型生成智能洞察", value=False,
+                                 disabled=not self.ai_analyzer.openai_api_key,
+                                 help="需要设置环境变量 OPENAI_API_KEY（可选 OPENAI_BASE_URL、OPENAI_MODEL）")
+        
         if st.button("🤖 生成AI分析报告"):
             with st.spinner("AI正在生成分析报告..."):
                 try:
-                    report = self.ai_analyzer.generate_insights_report(data)
+                    report = self.ai_analyzer.generate_insights_report(data, use_openai=use_openai)
                     st.markdown("### 📊 AI分析报告")
                     st.markdown(report)
                 except Exception as e:
@@ -619,23 +885,50 @@ class WeatherApp:
     
     def show_prediction_analysis(self, data):
         """显示预测分析"""
-        st.markdown('<h2 class="sub-header">🔮 预测分析</h2>', unsafe_allow_html=True)
-        
-        st.info("🚧 预测功能正在开发中，敬请期待！")
+        import plotly.graph_objects as go
         
-        st.markdown("### 📈 趋势分析")
-        data_copy = data.copy()
-        data_copy['day_of_year'] = data_copy['date'].dt.dayofyear
+        st.markdown('<h2 class="sub-header">🔮 预测分析</h2>', unsafe_allow_html=True)
         
-        from sklearn.linear_model import LinearRegression
+        if self.ai_analyzer is None:
+            st.error("AI分析器未初始化，无法进行预测")
+            return
         
-        X = data_copy[['day_of_year']]
-        y = data_copy['temperature']
+        days_to_predict = st.slider("预测天数", min_value=1, max_value=14, value=7)
+        with st.spinner("正在训练/加载预测模型..."):
+            forecast = self.ai_analyzer.predict_future_weather(data, days_to_predict=days_to_predict)
         
-        model = LinearRegression()
-        model.fit(X, y)
+        if forecast.empty:
+            st.warning("数据不足，无法进行预测。")
+        else:
+            st.markdown("### 🌤️ 未来天气预测")
+            history = data[data['date'] > data['date'].max() - pd.Timedelta(days=60)]
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(
+                x=history['date'], y=history['temperature'],
+                mode='lines', name='历史温度',
+                line=dict(color='#1f77b4', width=2)
+            ))
+            fig.add_trace(go.Scatter(
+                x=forecast['date'], y=forecast['temperature'],
+                mode='lines+markers', name='预测温度',
+                line=dict(color='#ff7f0e', width=2, dash='dash')
+            ))
+            fig.update_layout(
+                title=f"未来 {days_to_predict} 天温度预测",
+                xaxis_title="日期",
+                yaxis_title="温度 (°C)",
+                height=450
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(forecast, use_container_width=True, hide_index=True)
         
-        trend_slope = model.coef_[0]
+        st.markdown("### 📈 趋势分析")
+        # 温度对年内日序的一元线性回归斜率（闭式解）
+        day_of_year = (data['day_of_year'] if 'day_of_year' in data.columns
+                       else data['date'].dt.dayofyear).to_numpy(dtype=float, na_value=np.nan)
+        temperature = data['temperature'].to_numpy(dtype=float, na_value=np.nan)
+        valid = np.isfinite(day_of_year) & np.isfinite(temperature)
+        trend_slope = np.polyfit(day_of_year[valid], temperature[valid], 1)[0]
         
         if trend_slope > 0:
             trend_text = f"📈 温度呈上升趋势，每天平均上升 {trend_slope:.4f}°C"
@@ -705,22 +998,83 @@ class WeatherApp:
         with col4:
             st.metric("页面数量", "4个")
     
+    def show_performance(self):
+        """显示性能监控页面：各阶段的延迟统计、延迟分布直方图和指标导出"""
+        import plotly.express as px
+        
+        st.markdown('<h1 class="main-header">⏱️ 性能监控</h1>', unsafe_allow_html=True)
+        monitor = self.monitor
+        scope = "本进程内所有会话" if monitor.enabled else "通过 ?perf=1 开启了记录的会话"
+        if monitor.track_memory:
+            mode = "耗时 + 峰值内存（多个会话并发时峰值内存会相互干扰，仅供参考）"
+        else:
+            mode = "耗时（设置 WEATHER_PROFILE_MEMORY=1 可同时记录峰值内存）"
+        st.caption(f"监控范围：{scope}；记录内容：{mode}；每个阶段保留最近 {monitor.max_samples} 个样本")
+
+        summary = monitor.summary()
+        if summary.empty:
+            st.info("暂无性能样本，请先浏览其他页面。")
+            return
+
+        st.markdown('<h2 class="sub-header">📋 各阶段延迟统计（毫秒）</h2>', unsafe_allow_html=True)
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+
+        st.markdown('<h2 class="sub-header">📊 延迟分布</h2>', unsafe_allow_html=True)
+        stages = st.multiselect("选择阶段", options=summary['stage'].tolist(),
+                                default=summary['stage'].head(5).tolist())
+        if stages:
+            samples = monitor.samples()
+            samples = samples[samples['stage'].isin(stages)]
+            fig = px.histogram(samples, x='ms', color='stage', nbins=50, barmode='overlay', opacity=0.6,
+                               labels={'ms': '耗时 (ms)', 'stage': '阶段'}, log_y=True)
+            fig.update_layout(height=450)
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown('<h2 class="sub-header">🔗 共享数据集</h2>', unsafe_allow_html=True)
+        store = get_dataset_store()
+        datasets = pd.DataFrame.from_dict(store.summary(), orient='index')
+        st.caption(f"{'内存映射 Arrow 文件' if store.memory_map else '进程内存'}：{store.directory}")
+        if not datasets.empty:
+            st.dataframe(datasets, use_container_width=True)
+
+        st.markdown('<h2 class="sub-header">💾 导出</h2>', unsafe_allow_html=True)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("写入指标文件"):
+                count = monitor.export(PROFILE_PATH)
+                st.success(f"已追加 {count} 条样本到 {PROFILE_PATH}")
+        with col2:
+            st.download_button("下载 JSONL", data=monitor.to_jsonl(), file_name="perf_metrics.jsonl",
+                               mime="application/jsonl")
+        with col3:
+            if st.button("清空样本"):
+                monitor.clear()
+                st.info("样本已清空。")
+    
     def run(self):
         """运行应用"""
-        page = self.show_sidebar()
-        if page == "📊 数据概览":
-            self.show_data_overview()
-        elif page == "📈 可视化分析":
-            self.show_visualization_analysis()
-        elif page == "🤖 AI智能分析":
-            self.show_ai_analysis()
-        elif page == "ℹ️ 项目介绍":
-            self.show_project_info()
+        with self.monitor.stage('app.run'):
+            page = self.show_sidebar()
+            if page == "📊 数据概览":
+                self.show_data_overview()
+            elif page == "📈 可视化分析":
+                self.show_visualization_analysis()
+            elif page == "🤖 AI智能分析":
+                self.show_ai_analysis()
+            elif page == "ℹ️ 项目介绍":
+                self.show_project_info()
+            elif page == PERF_PAGE:
+                self.show_performance()
 
 def main():
     """主函数"""
-    app = WeatherApp()
-    app.run()
+    # ?perf=1 只为当前会话开启记录（在本会话的运行线程中激活），不修改进程内共享的监控器
+    if st.query_params.get("perf") == "1":
+        st.session_state['profiling'] = True
+    profiling = st.session_state.get('profiling', False)
+    with get_performance_monitor().activate() if profiling else nullcontext():
+        app = WeatherApp()
+        app.run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+"""
+导入耗时基准测试
+负责人：Person 1 (组长)
+功能：在全新的 Python 进程中测量各模块及 Web 应用的导入耗时、进程峰值内存，列出被连带导入的重量级依赖，
+     并与 run_benchmarks.py 共用基线文件标记回退（对应 Web 应用冷启动和进程池中每个工作进程的导入开销）
+
+用法：
+    python benchmarks/import_times.py
+    python benchmarks/import_times.py --repeat 10 --save-baseline
+存在回退时退出码为 1。
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from run_benchmarks import DEFAULT_BASELINE, ROOT, check_baseline, save_baseline
+
+SRC = os.path.join(ROOT, 'src')
+APP = os.path.join(ROOT, 'app', 'streamlit_app.py')
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'plotly', 'sklearn', 'scipy', 'openai', 'streamlit']
+
+CASES = {
+    'pandas': "import pandas",
+    'data_processor': "import data_processor",
+    'visualizer': "import visualizer",
+    'ai_analyzer': "import ai_analyzer",
+    # 裸模式导入 Streamlit 应用脚本（执行模块级代码但不渲染页面），近似应用冷启动
+    'app': ("import importlib.util, logging\n"
+            "logging.disable(logging.WARNING)\n"
+            f"spec = importlib.util.spec_from_file_location('weather_app', {APP!r})\n"
+            "spec.loader.exec_module(importlib.util.module_from_spec(spec))"),
+}
+
+CHILD_TEMPLATE = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+peak_mb = None
+try:
+    # VmHWM 是本进程的常驻内存峰值；ru_maxrss 会继承 fork 时父进程的值，不能反映导入开销
+    with open('/proc/self/status') as f:
+        peak_mb = next(int(line.split()[1]) / 1024 for line in f if line.startswith('VmHWM:'))
+except (OSError, StopIteration):
+    pass
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'seconds': seconds, 'peak_mb': peak_mb, 'heavy': heavy}}))
+"""
+
+
+def measure_import(statement, repeat):
+    """
+    在 repeat 个全新进程中执行导入语句
+    :return: 最短导入耗时对应的结果字典（seconds、peak_mb、heavy、process_seconds）
+    """
+    code = CHILD_TEMPLATE.format(src=SRC, statement=statement, heavy=HEAVY_MODULES)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        process_seconds = time.perf_counter() - start
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result['process_seconds'] = process_seconds
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模块导入耗时基准测试")
+    parser.add_argument('--only', default=None, help=f"只测量指定的模块（逗号分隔），可选: {','.join(CASES)}")
+    parser.add_argument('--repeat', type=int, default=5, help="每个模块的测量次数（取最短耗时）")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线文件路径（与 run_benchmarks.py 共用）")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果写入基线文件")
+    parser.add_argument('--threshold', type=float, default=0.25, help="判定回退的相对阈值")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(',')] if args.only else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"未知的模块: {unknown}")
+
+    results = {}
+    print(f"{'模块':<43} {'导入耗时':>10} {'进程总耗时':>10} {'峰值内存':>10}  连带导入")
+    for name in names:
+        result = measure_import(CASES[name], args.repeat)
+        peak = f"{result['peak_mb']:.1f} MB" if result['peak_mb'] is not None else '-'
+        print(f"{'import.' + name:<45} {result['seconds'] * 1000:>9.0f} ms {result['process_seconds'] * 1000:>9.0f} ms "
+              f"{peak:>12}  {', '.join(result['heavy']) or '-'}")
+        results[f'import.{name}'] = {
+            'seconds': round(result['seconds'], 6),
+            'peak_mb': round(result['peak_mb'], 3) if result['peak_mb'] is not None else None,
+        }
+
+    if args.save_baseline:
+        save_baseline(os.path.abspath(args.baseline), results)
+        return 0
+    return check_baseline(os.path.abspath(args.baseline), results, args.threshold)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
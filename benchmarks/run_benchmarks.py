@@ -0,0 +1,322 @@
+"""
+性能基准测试
+负责人：Person 1 (组长)
+功能：在 1K / 100K / 10M 行规模下测量数据处理、AI分析、可视化和Web应用各页面函数的耗时与峰值内存，
+     并与保存的基线比较，标记性能回退
+
+用法：
+    python benchmarks/run_benchmarks.py                          # 默认 1k、100k 两个规模
+    python benchmarks/run_benchmarks.py --scales 1k,100k,10m     # 包含千万行规模（耗时较长）
+    python benchmarks/run_benchmarks.py --only clean_data,detect_anomalies
+    python benchmarks/run_benchmarks.py --save-baseline          # 把本次结果保存为基线
+仓库中的 benchmarks/baseline.json 是参考基线（meta 中记录了生成环境），在其他机器上应先用 --save-baseline 重新生成。
+存在回退时退出码为 1，找不到基线文件时为 2，可直接用于CI。
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import matplotlib
+matplotlib.use('Agg')
+
+from data_processor import WeatherDataProcessor
+from visualizer import WeatherVisualizer
+from ai_analyzer import WeatherAIAnalyzer
+from storage import get_storage
+from memmap_store import MemmapDataset
+
+warnings.filterwarnings('ignore')
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+# generate_sample_data 按天生成，纳秒精度的日期范围（1677~2262年）最多约 21 万天
+MAX_SAMPLE_DAYS = 200_000
+
+
+def make_dataset(rows, seed=42):
+    """生成约 rows 行的多站点小时级清洗后数据（不落盘）"""
+    processor = WeatherDataProcessor()
+    n_stations = max(1, rows // 8760)
+    periods = max(2, rows // n_stations)
+    end = pd.Timestamp('2020-01-01') + pd.Timedelta(hours=periods - 1)
+    data = processor.generate_station_data(n_stations, '2020-01-01', end, freq='h', seed=seed)
+    return processor._apply_cleaning_rules(data)
+
+
+def _quiet_streamlit():
+    """裸模式下每次调用 st.* 都会输出 missing ScriptRunContext 警告，把 Streamlit 日志级别调到 ERROR"""
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('streamlit'):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def load_app_module():
+    """以裸模式导入 Streamlit 应用（不启动服务器），用于直接调用各页面函数"""
+    import streamlit  # noqa: F401  先导入以创建各日志器
+    _quiet_streamlit()
+    spec = importlib.util.spec_from_file_location('weather_app', os.path.join(ROOT, 'app', 'streamlit_app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _quiet_streamlit()
+    return module
+
+
+def build_cases(app_module):
+    """
+    基准用例：名称 -> (准备函数, 被测函数)。
+    准备函数接收 (行数, 数据) 返回被测函数的参数，其耗时不计入结果。
+    """
+    processor = WeatherDataProcessor()
+    visualizer = WeatherVisualizer()
+    analyzer = WeatherAIAnalyzer()
+    output_dir = tempfile.mkdtemp(prefix='weather_bench_')
+
+    def sample_days(rows, data):
+        if rows > MAX_SAMPLE_DAYS:
+            return None
+        end = pd.Timestamp('1700-01-01') + pd.Timedelta(days=rows - 1)
+        return ('1700-01-01', end.strftime('%Y-%m-%d'))
+
+    def raw_data(rows, data):
+        return (data[['station_id', 'date', 'temperature', 'humidity', 'precipitation', 'wind_speed']].copy(),)
+
+    def plot_args(name):
+        return lambda rows, data: (data, os.path.join(output_dir, f'{name}.png'))
+
+    def stored(storage_format):
+        # 落盘不计入耗时；被测的是读取一个站点某个月数据的随机访问
+        storage = get_storage(storage_format)
+
+        def prepare(rows, data):
+            path = os.path.join(output_dir, f'bench_{rows}{storage.suffix}')
+            storage.save(data, path)
+            station = data['station_id'].iloc[-1]
+            start = data['date'].min().normalize()
+            return (storage, path, station, start, start + pd.Timedelta(days=30))
+        return prepare
+
+    def load_station_month(storage, path, station, start, end):
+        data = storage.load(path, start_date=start, end_date=end)
+        return data[data['station_id'] == station]
+
+    cases = {
+        'generate_sample_data': (sample_days, lambda start, end: processor.generate_sample_data(start, end)),
+        'clean_data': (raw_data, processor.clean_data),
+        'get_statistics': (lambda rows, data: (data,), processor.get_statistics),
+        # 每次调用使用新的分析器，测量包含模型训练的完整耗时
+        'detect_anomalies': (lambda rows, data: (data,),
+                             lambda data: WeatherAIAnalyzer().detect_anomalies(data, inplace=False)),
+        'detect_anomalies_cached': (lambda rows, data: (data,),
+                                    lambda data: analyzer.detect_anomalies(data, inplace=False)),
+        'generate_insights_report': (lambda rows, data: (data,),
+                                     lambda data: WeatherAIAnalyzer().generate_insights_report(data)),
+        'plot_temperature_trend': (plot_args('temperature_trend'),
+                                   lambda data, path: visualizer.plot_temperature_trend(data, path, show=False)),
+        'plot_seasonal_comparison': (plot_args('seasonal_comparison'),
+                                     lambda data, path: visualizer.plot_seasonal_comparison(data, path, show=False)),
+        'plot_correlation_heatmap': (plot_args('correlation_heatmap'),
+                                     lambda data, path: visualizer.plot_correlation_heatmap(data, path, show=False)),
+        'plot_weather_patterns': (plot_args('weather_patterns'),
+                                  lambda data, path: visualizer.plot_weather_patterns(data, path, show=False)),
+        'create_interactive_dashboard': (lambda rows, data: (data,), visualizer.create_interactive_dashboard),
+        'load_station_month.feather': (stored('feather'), load_station_month),
+        'load_station_month.memmap': (stored('memmap'),
+                                      lambda storage, path, station, start, end:
+                                      MemmapDataset(path).slice(start, end, stations=station)),
+    }
+
+    if app_module is not None:
+        def app_page(method_name):
+            def prepare(rows, data):
+                app = app_module.WeatherApp()
+                app.data, app.data_key, app.data_loaded = data, f'bench:{rows}', True
+                return (getattr(app, method_name), data)
+            return prepare, lambda page, data: page(data)
+
+        def overview(rows, data):
+            app = app_module.WeatherApp()
+            app.data, app.data_key, app.data_loaded = data, f'bench:{rows}', True
+            return (app.show_data_overview,)
+
+        cases['app.show_data_overview'] = (overview, lambda page: page())
+        for method_name in ['show_temperature_trend', 'show_seasonal_comparison', 'show_correlation_analysis',
+                            'show_weather_patterns', 'show_interactive_dashboard', 'show_anomaly_detection']:
+            cases[f'app.{method_name}'] = app_page(method_name)
+    return cases
+
+
+def measure(func, args, repeat):
+    """返回 (最短耗时秒数, 峰值内存MB)；耗时与内存分开测量，避免 tracemalloc 的开销影响计时"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak / 1024 ** 2
+
+
+def run(scales, only=None, repeat=3):
+    app_module = None
+    if only is None or any(name.startswith('app.') for name in only):
+        try:
+            app_module = load_app_module()
+        except Exception as e:
+            print(f"跳过Web应用页面基准: {e}")
+    cases = build_cases(app_module)
+    if only is not None:
+        cases = {name: case for name, case in cases.items() if name in only}
+
+    results = {}
+    for scale in scales:
+        rows = SCALES[scale]
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            data = make_dataset(rows)
+        # 大规模数据只计时一次
+        scale_repeat = repeat if rows <= 100_000 else 1
+        for name, (prepare, func) in cases.items():
+            args = prepare(rows, data)
+            key = f'{name}@{scale}'
+            if args is None:
+                print(f"{key:<45} 跳过")
+                continue
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                seconds, peak_mb = measure(func, args, scale_repeat)
+            results[key] = {'rows': rows, 'seconds': round(seconds, 6), 'peak_mb': round(peak_mb, 3)}
+            print(f"{key:<45} {seconds * 1000:>12.1f} ms {peak_mb:>10.1f} MB")
+        del data
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds=0.005, min_mb=1.0):
+    """
+    与基线比较，耗时或峰值内存超过基线 (1 + threshold) 倍且绝对差值超过噪声下限时记为回退
+    :return: 回退列表
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric, floor in (('seconds', min_seconds), ('peak_mb', min_mb)):
+            if previous.get(metric) is None or current.get(metric) is None:
+                continue
+            old, new = previous[metric], current[metric]
+            if new > old * (1 + threshold) and new - old > floor:
+                regressions.append((key, metric, old, new))
+    return regressions
+
+
+def environment_info():
+    """记录基准运行环境，便于判断结果是否可比"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'timestamp': pd.Timestamp.now().isoformat(timespec='seconds'),
+    }
+
+
+def save_baseline(path, results):
+    """把结果合并写入基线文件（保留其他用例的已有基线）"""
+    baseline = {'meta': {}, 'results': {}}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+    baseline['meta'] = environment_info()
+    baseline['results'].update(results)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+    print(f"基线已保存到: {path}")
+
+
+def check_baseline(path, results, threshold):
+    """
+    与基线比较并打印回退项
+    :return: 退出码，存在回退时为 1，找不到基线文件时为 2
+    """
+    if not os.path.exists(path):
+        print(f"未找到基线文件 {path}，无法判断性能回退，使用 --save-baseline 生成。")
+        return 2
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    meta, current = baseline.get('meta', {}), environment_info()
+    differences = [key for key in ('platform', 'cpu_count', 'python', 'pandas', 'numpy')
+                   if key in meta and meta[key] != current[key]]
+    if differences:
+        print("注意：基线的运行环境与本机不同，结果可能不可比: "
+              + ", ".join(f"{key} {meta[key]} -> {current[key]}" for key in differences))
+    regressions = compare(results, baseline['results'], threshold)
+    if not regressions:
+        print(f"未发现性能回退（阈值 {threshold:.0%}）。")
+        return 0
+    print(f"发现 {len(regressions)} 项性能回退（阈值 {threshold:.0%}）:")
+    for key, metric, old, new in regressions:
+        unit = 's' if metric == 'seconds' else 'MB'
+        print(f"  {key:<45} {metric}: {old:.3f}{unit} -> {new:.3f}{unit} (+{(new / old - 1):.0%})")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="气象数据分析平台性能基准测试")
+    parser.add_argument('--scales', default='1k,100k', help=f"逗号分隔的数据规模，可选: {','.join(SCALES)}")
+    parser.add_argument('--only', default=None, help="只运行指定的用例（逗号分隔）")
+    parser.add_argument('--repeat', type=int, default=3, help="小规模用例的重复次数（取最短耗时）")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果写入基线文件")
+    parser.add_argument('--threshold', type=float, default=0.25, help="判定回退的相对阈值")
+    parser.add_argument('--output', default=None, help="把本次结果另存为JSON文件")
+    args = parser.parse_args()
+
+    scales = [scale.strip().lower() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"不支持的数据规模: {unknown}")
+    only = [name.strip() for name in args.only.split(',')] if args.only else None
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    # 数据处理模块会在当前目录下写 data/，在临时目录中运行以免污染仓库
+    workdir = tempfile.mkdtemp(prefix='weather_bench_work_')
+    os.chdir(workdir)
+    results = run(scales, only, args.repeat)
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({'meta': environment_info(), 'results': results}, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        save_baseline(baseline_path, results)
+        return 0
+    return check_baseline(baseline_path, results, args.threshold)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
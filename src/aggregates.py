@@ -0,0 +1,109 @@
+"""
+聚合立方体模块
+负责人：Person 2 (2001wzh)
+功能：在数据入库时预先计算 站点×年×月×季节×要素 的可合并聚合量（sum/count/sumsq/min/max），
+     季节、月度等视图直接由立方体汇总得到，无需重新扫描原始数据
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from features import season_from_month
+except ImportError:  # 以 src.aggregates 方式导入时
+    from .features import season_from_month
+
+MEASURES = ['temperature', 'humidity', 'precipitation', 'wind_speed']
+DIMENSIONS = ['station_id', 'year', 'month', 'season']
+STATISTICS = ['sum', 'count', 'sumsq', 'min', 'max']
+
+
+class AggregateCube:
+    """可合并的预聚合立方体"""
+
+    def __init__(self, table, variables):
+        """
+        :param table: 以 DIMENSIONS 为列、每个要素带 *_sum/_count/_sumsq/_min/_max 列及 rows 列的聚合表
+        :param variables: 立方体包含的要素
+        """
+        self.table = table
+        self.variables = list(variables)
+
+    @classmethod
+    def build(cls, df, variables=MEASURES, station_col='station_id'):
+        """
+        扫描一遍原始数据构建立方体
+        :param df: 包含 date、要素列及（可选）season、站点列的DataFrame
+        :return: AggregateCube
+        """
+        variables = [var for var in variables if var in df.columns]
+        dates = df['date'] if pd.api.types.is_datetime64_any_dtype(df['date']) else pd.to_datetime(df['date'])
+        month = df['month'] if 'month' in df.columns else dates.dt.month
+        if 'season' in df.columns:
+            season = df['season']
+        else:
+            season = pd.Series(season_from_month(month.to_numpy()), index=df.index)
+        keys = [
+            df[station_col].astype(str).rename('station_id') if station_col in df.columns
+            else pd.Series('all', index=df.index, name='station_id'),
+            dates.dt.year.rename('year'),
+            month.rename('month'),
+            season.rename('season'),
+        ]
+
+        values = df[variables].astype(float)
+        grouped = values.groupby(keys, observed=True, sort=True)
+        parts = {
+            'sum': grouped.sum(),
+            'count': grouped.count(),
+            'sumsq': np.square(values).groupby(keys, observed=True, sort=True).sum(),
+            'min': grouped.min(),
+            'max': grouped.max(),
+        }
+        table = pd.concat({stat: part for stat, part in parts.items()}, axis=1)
+        table.columns = [f'{var}_{stat}' for stat, var in table.columns]
+        table['rows'] = grouped.size()
+        return cls(table.reset_index(), variables)
+
+    def merge(self, other):
+        """合并另一个立方体（如新追加的数据或其他站点），返回新的立方体"""
+        combined = pd.concat([self.table, other.table], ignore_index=True)
+        agg = {'rows': 'sum'}
+        for var in self.variables:
+            for stat in STATISTICS:
+                agg[f'{var}_{stat}'] = stat if stat in ('min', 'max') else 'sum'
+        table = combined.groupby(DIMENSIONS, observed=True, sort=True).agg(agg).reset_index()
+        return AggregateCube(table, self.variables)
+
+    def filter(self, stations=None, years=None, months=None, seasons=None):
+        """按维度取值筛选立方体"""
+        mask = np.ones(len(self.table), dtype=bool)
+        for column, values in (('station_id', stations), ('year', years), ('month', months), ('season', seasons)):
+            if values is not None:
+                mask &= self.table[column].isin(list(values)).to_numpy()
+        return AggregateCube(self.table[mask], self.variables)
+
+    def rollup(self, by, variable):
+        """
+        沿指定维度汇总一个要素
+        :param by: 维度名，如 'season'、'month'、'year'、'station_id'
+        :param variable: 要素名
+        :return: 以该维度为索引，包含 mean/std/min/max/count 列的DataFrame
+        """
+        grouped = self.table.groupby(by, observed=True, sort=True)
+        total = grouped[[f'{variable}_{stat}' for stat in ('sum', 'count', 'sumsq')]].sum()
+        n = total[f'{variable}_count']
+        mean = total[f'{variable}_sum'] / n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (total[f'{variable}_sumsq'] - n * mean ** 2) / (n - 1)
+        return pd.DataFrame({
+            'mean': mean,
+            'std': np.sqrt(var.clip(lower=0)).where(n > 1),
+            'min': grouped[f'{variable}_min'].min(),
+            'max': grouped[f'{variable}_max'].max(),
+            'count': n,
+        })
+
+    def row_counts(self, by):
+        """沿指定维度汇总行数"""
+        return self.table.groupby(by, observed=True, sort=True)['rows'].sum()
@@ -6,34 +6,212 @@ AI分析模块
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest # 用于异常检测
-# import openai # 如果要对接OpenAI API，取消此行注释
 import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    from forecaster import WeatherForecaster, TARGETS as FORECAST_TARGETS
+    from llm_client import AsyncInsightClient, ResponseCache, DEFAULT_MODEL
+    from prompt_digest import build_digest, format_digest
+except ImportError:  # 以 src.ai_analyzer 方式导入时
+    from .forecaster import WeatherForecaster, TARGETS as FORECAST_TARGETS
+    from .llm_client import AsyncInsightClient, ResponseCache, DEFAULT_MODEL
+    from .prompt_digest import build_digest, format_digest
+
+
+def _detect_station_block(shm_name, shape, start, stop, contamination, random_state):
+    """
+    在共享内存中的特征矩阵上对单个站点的行 [start, stop) 训练并打分（供进程池调用）。
+    :return: (start, 异常分数数组)
+    """
+    from multiprocessing import shared_memory
+    from sklearn.ensemble import IsolationForest
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[start:stop]
+        if len(block) < 2:
+            scores = np.zeros(len(block))
+        else:
+            model = IsolationForest(contamination=contamination, random_state=random_state)
+            scores = model.fit(block).decision_function(block)
+        del block  # 关闭共享内存前必须释放对缓冲区的引用
+    finally:
+        shm.close()
+    return start, scores
+
+
+# 报告统计量中需要计数的降水阈值（mm）：有降水、强降水
+PRECIPITATION_THRESHOLDS = (0, 20)
+# 单遍统计时每块的行数，使一块数据在计算各统计量期间留在CPU缓存中
+STATS_BLOCK_ROWS = 65536
+
+
+def _column_statistics(values, thresholds=()):
+    """
+    分块单遍计算一列的计数、和、最小值、最大值及大于各阈值的个数。
+    每块数据只从内存读取一次，临时内存只与块大小有关。
+    """
+    count, total = 0, 0.0
+    minimum, maximum = np.inf, -np.inf
+    above = [0] * len(thresholds)
+    for start in range(0, len(values), STATS_BLOCK_ROWS):
+        block = values[start:start + STATS_BLOCK_ROWS]
+        block = block[~np.isnan(block)]
+        if len(block) == 0:
+            continue
+        count += len(block)
+        total += float(block.sum(dtype=np.float64))
+        minimum = min(minimum, float(block.min()))
+        maximum = max(maximum, float(block.max()))
+        for i, threshold in enumerate(thresholds):
+            above[i] += int(np.count_nonzero(block > threshold))
+    return {
+        'count': count,
+        'sum': total,
+        'mean': total / count if count else np.nan,
+        'min': minimum if count else np.nan,
+        'max': maximum if count else np.nan,
+        'above': dict(zip(thresholds, above)),
+    }
+
 
 class WeatherAIAnalyzer:
-    def __init__(self, openai_api_key=None):
+    def __init__(self, openai_api_key=None, model_dir=None, drift_threshold=0.5, llm_client=None, max_cached_models=16,
+                 forecast_horizon=14):
         """
         初始化AI分析器。
         :param openai_api_key: (可选) OpenAI API密钥。
+        :param model_dir: (可选) 持久化已训练异常检测模型的目录，None 表示只缓存在内存中。
+        :param drift_threshold: 新追加数据任一特征的均值偏移超过训练数据标准差的该倍数时重新训练模型。
+        :param llm_client: (可选) AsyncInsightClient 实例；未提供时在首次需要时按 openai_api_key 创建，
+                           接口地址和模型名读取环境变量 OPENAI_BASE_URL、OPENAI_MODEL。
+        :param max_cached_models: 内存中最多缓存的模型个数，超出后移除最久未使用的模型。
+        :param forecast_horizon: 预测器训练时的最大预测天数；不超过该值的 days_to_predict 共用同一个预测器，
+                                 只截取前若干天的结果。
         """
         self.openai_api_key = openai_api_key
-        # if self.openai_api_key:
-        #     try:
-        #         openai.api_key = self.openai_api_key
-        #         print("OpenAI API key configured.")
-        #     except Exception as e:
-        #         print(f"Error configuring OpenAI: {e}")
-        # else:
-        #     print("OpenAI API key not provided. AI report generation will use template.")
-        pass
-
-    def detect_anomalies(self, df, features=['temperature', 'humidity', 'precipitation', 'wind_speed'], contamination='auto', random_state=42):
+        self.model_dir = model_dir
+        self.drift_threshold = drift_threshold
+        self.llm_client = llm_client
+        self.max_cached_models = max_cached_models
+        self.forecast_horizon = forecast_horizon
+        # 分析器可能被多个会话线程共享（如 Streamlit 的 cache_resource），缓存的读写都在锁内进行
+        self._model_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _get_llm_client(self):
+        """按需创建大模型客户端，响应缓存保存在 model_dir（未设置时为 results）下"""
+        if self.llm_client is None and self.openai_api_key:
+            cache_dir = self.model_dir or 'results'
+            self.llm_client = AsyncInsightClient(
+                api_key=self.openai_api_key,
+                model=os.getenv("OPENAI_MODEL", DEFAULT_MODEL),
+                cache=ResponseCache(os.path.join(cache_dir, '.llm_cache.sqlite')),
+            )
+        return self.llm_client
+
+    @staticmethod
+    def _row_hashes(df_analysis):
+        """逐行计算内容哈希"""
+        return pd.util.hash_pandas_object(df_analysis, index=False).values
+
+    @staticmethod
+    def _hash_fingerprint(row_hashes):
+        """由逐行哈希计算数据指纹"""
+        return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+    @classmethod
+    def _data_fingerprint(cls, df_analysis):
+        """计算特征数据的内容指纹"""
+        return cls._hash_fingerprint(cls._row_hashes(df_analysis))
+
+    def _cache_get(self, cache_key):
+        """读取内存缓存并标记为最近使用"""
+        with self._cache_lock:
+            entry = self._model_cache.get(cache_key)
+            if entry is not None:
+                self._model_cache.move_to_end(cache_key)
+            return entry
+
+    def _cache_put(self, cache_key, entry):
+        """写入内存缓存，超出 max_cached_models 时移除最久未使用的模型"""
+        with self._cache_lock:
+            self._model_cache[cache_key] = entry
+            self._model_cache.move_to_end(cache_key)
+            while len(self._model_cache) > self.max_cached_models:
+                self._model_cache.popitem(last=False)
+
+    def _model_path(self, cache_key, prefix="isolation_forest"):
+        """模型持久化文件路径"""
+        digest = hashlib.sha1(repr(cache_key).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.model_dir, f"{prefix}_{digest}.joblib")
+
+    def _get_cached_model(self, cache_key):
+        """先查内存缓存，再查磁盘上持久化的模型"""
+        entry = self._cache_get(cache_key)
+        if entry is None and self.model_dir:
+            path = self._model_path(cache_key)
+            if os.path.exists(path):
+                import joblib
+                entry = joblib.load(path)
+                self._cache_put(cache_key, entry)
+        return entry
+
+    def _find_prefix_model(self, model_key, row_hashes):
+        """
+        查找训练数据恰好是当前数据前若干行的缓存模型（即当前数据是在训练数据之后追加新行得到的）
+        :return: 训练行数最多的匹配模型，没有时返回 None
+        """
+        with self._cache_lock:
+            candidates = [entry for key, entry in self._model_cache.items()
+                          if key[:-1] == model_key and entry['n_fit'] < len(row_hashes)]
+        for entry in sorted(candidates, key=lambda entry: entry['n_fit'], reverse=True):
+            if self._hash_fingerprint(row_hashes[:entry['n_fit']]) == entry['fingerprint']:
+                return entry
+        return None
+
+    def _fit_model(self, cache_key, df_analysis, fingerprint, contamination, random_state):
+        """训练新模型并写入缓存"""
+        # scikit-learn 导入较慢，只在需要训练时导入
+        from sklearn.ensemble import IsolationForest
+        model = IsolationForest(contamination=contamination, random_state=random_state)
+        model.fit(df_analysis)
+        entry = {
+            'model': model,
+            'fingerprint': fingerprint,
+            'scores': model.decision_function(df_analysis),
+            'n_fit': len(df_analysis),
+            'fit_mean': df_analysis.mean().values,
+            'fit_std': df_analysis.std().replace(0, 1).fillna(1).values,
+        }
+        if self.model_dir:
+            import joblib
+            os.makedirs(self.model_dir, exist_ok=True)
+            joblib.dump(entry, self._model_path(cache_key))
+        self._cache_put(cache_key, entry)
+        return entry
+
+    def _has_drifted(self, entry, df_analysis):
+        """比较训练数据之后追加的行与训练数据的特征均值，判断是否发生漂移（不与训练行混在一起计算，避免偏移被稀释）"""
+        appended = df_analysis.iloc[entry['n_fit']:]
+        shift = np.abs(appended.mean().values - entry['fit_mean']) / entry['fit_std']
+        return bool(np.any(shift > self.drift_threshold))
+
+    def detect_anomalies(self, df, features=['temperature', 'humidity', 'precipitation', 'wind_speed'], contamination='auto', random_state=42, refit=False, inplace=True):
         """
         使用Isolation Forest检测数据中的异常点。
+        已训练的模型按 (特征, contamination, random_state, 数据指纹) 缓存，数据相同时直接复用结果。
+        数据是某个已训练数据追加新行得到的且未发生漂移时，用该模型的 decision_function 对全部行打分；
+        其他数据（包括筛选出的子集）、发生漂移或 refit=True 时训练新模型。
         :param df: 输入的DataFrame，包含日期和指定的特征列。
         :param features: 用于检测异常的特征列表。
         :param contamination: 数据集中异常点的比例，'auto'由算法决定。
         :param random_state: 随机种子，保证结果可复现。
+        :param refit: 是否强制重新训练模型。
+        :param inplace: 是否把 anomaly_score、is_anomaly 列写回 df。为 False 时不修改 df，
+                        只有返回的异常行带有这两列，调用方无需先复制整个DataFrame。
         :return: 一个包含异常数据的DataFrame，以及一个包含异常信息的元组 (anomalies_df, info_dict)。
                  如果无异常或出错，anomalies_df可能为空。
         """
@@ -41,28 +219,52 @@ class WeatherAIAnalyzer:
             print("Error: DataFrame is empty or missing required features for anomaly detection.")
             return pd.DataFrame(), {"message": "Data is empty or features are missing."}
 
-        df_analysis = df[features].copy()
-        df_analysis.fillna(df_analysis.mean(), inplace=True) # 简单处理缺失值
+        df_analysis = df[features]
+        if df_analysis.isna().any().any():
+            df_analysis = df_analysis.fillna(df_analysis.mean()) # 简单处理缺失值
 
         if df_analysis.empty or len(df_analysis) < 2: # Isolation Forest 需要至少2个样本
              print("Warning: Not enough data points for anomaly detection after preprocessing.")
              return pd.DataFrame(), {"message": "Not enough data for anomaly detection."}
 
         try:
-            model = IsolationForest(contamination=contamination, random_state=random_state)
-            model.fit(df_analysis)
-            
-            # 预测异常 (-1 表示异常, 1 表示正常)
-            df['anomaly_score'] = model.decision_function(df_analysis)
-            df['is_anomaly'] = model.predict(df_analysis)
+            model_key = (tuple(features), contamination, random_state)
+            row_hashes = self._row_hashes(df_analysis)
+            fingerprint = self._hash_fingerprint(row_hashes)
+            cache_key = model_key + (fingerprint,)
+            entry = None if refit else self._get_cached_model(cache_key)
+            base = None if refit or entry is not None else self._find_prefix_model(model_key, row_hashes)
+
+            if entry is not None:
+                model_status = "cached"
+                scores = entry['scores']
+            elif base is not None and not self._has_drifted(base, df_analysis):
+                model_status = "scored"
+                scores = base['model'].decision_function(df_analysis)
+                # 指纹和训练行数仍是训练数据的，后续追加的数据也能找到该模型
+                self._cache_put(cache_key, dict(base, scores=scores))
+            else:
+                entry = self._fit_model(cache_key, df_analysis, fingerprint, contamination, random_state)
+                model_status = "fitted"
+                scores = entry['scores']
             
-            anomalies_df = df[df['is_anomaly'] == -1].copy()
+            # 预测异常 (-1 表示异常, 1 表示正常)，与 model.predict 的判定规则一致
+            is_anomaly = scores < 0
+            if inplace:
+                df['anomaly_score'] = scores
+                df['is_anomaly'] = np.where(is_anomaly, -1, 1)
+            # 只复制异常行
+            anomalies_df = df[is_anomaly].copy()
+            if not inplace:
+                anomalies_df['anomaly_score'] = scores[is_anomaly]
+                anomalies_df['is_anomaly'] = -1
             
             anomaly_info = {
                 "total_points_analyzed": len(df),
                 "anomalies_found": len(anomalies_df),
                 "features_used": features,
-                "contamination_setting": contamination
+                "contamination_setting": contamination,
+                "model_status": model_status
             }
             
             if not anomalies_df.empty:
@@ -76,51 +278,132 @@ class WeatherAIAnalyzer:
             print(f"Error during anomaly detection: {e}")
             return pd.DataFrame(), {"message": f"Error during anomaly detection: {e}"}
 
-    def get_data_summary(self, df):
+    def detect_anomalies_by_station(self, df, station_col='station_id', features=['temperature', 'humidity', 'precipitation', 'wind_speed'], contamination='auto', random_state=42, n_workers=None):
+        """
+        按站点分别训练Isolation Forest并打分，各站点在进程池中并行处理。
+        特征矩阵只复制一次到共享内存，子进程直接读取，不序列化DataFrame。
+        :param df: 包含站点列和特征列的DataFrame，不会被修改。
+        :param station_col: 站点ID列名。
+        :param features: 用于检测异常的特征列表。
+        :param contamination: 数据集中异常点的比例，'auto'由算法决定。
+        :param random_state: 随机种子，保证结果可复现。
+        :param n_workers: 进程数，None 表示使用全部CPU核心。
+        :return: (带 anomaly_score / is_anomaly 列的结果DataFrame, 信息字典)
+        """
+        required = [station_col] + list(features)
+        if df.empty or not all(col in df.columns for col in required):
+            print("Error: DataFrame is empty or missing required columns for station anomaly detection.")
+            return pd.DataFrame(), {"message": "Data is empty or features are missing."}
+
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import shared_memory
+
+        try:
+            # 按站点排序，使每个站点在矩阵中占据连续的行区间；缺少站点ID的行不参与检测
+            codes, stations = pd.factorize(df[station_col])
+            valid = np.flatnonzero(codes >= 0)
+            if len(valid) < len(codes):
+                print(f"Warning: {len(codes) - len(valid)} rows without {station_col} are skipped.")
+            order = valid[np.argsort(codes[valid], kind='stable')]
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(codes[valid], minlength=len(stations)))])
+
+            features_df = df[features]
+            features_df = features_df.fillna(features_df.groupby(codes).transform('mean')).fillna(features_df.mean())
+            matrix = features_df.to_numpy(dtype=np.float64)[order]
+
+            shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+            try:
+                shared = np.ndarray(matrix.shape, dtype=np.float64, buffer=shm.buf)
+                shared[:] = matrix
+                del matrix
+                sorted_scores = np.zeros(len(order))
+                n_stations = len(stations)
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    results = executor.map(
+                        _detect_station_block,
+                        [shm.name] * n_stations, [shared.shape] * n_stations,
+                        bounds[:-1], bounds[1:],
+                        [contamination] * n_stations, [random_state] * n_stations,
+                        chunksize=max(1, n_stations // (4 * (n_workers or os.cpu_count() or 1)))
+                    )
+                    for start, block_scores in results:
+                        sorted_scores[start:start + len(block_scores)] = block_scores
+                del shared
+            finally:
+                shm.close()
+                shm.unlink()
+
+            # 未参与检测的行分数为 NaN，不判为异常
+            scores = np.full(len(df), np.nan)
+            scores[order] = sorted_scores
+            result = df.assign(anomaly_score=scores, is_anomaly=np.where(scores < 0, -1, 1))
+
+            anomalies_per_station = (result['is_anomaly'] == -1).groupby(result[station_col], observed=True).sum()
+            anomaly_info = {
+                "total_points_analyzed": len(order),
+                "anomalies_found": int(anomalies_per_station.sum()),
+                "stations_analyzed": len(stations),
+                "anomalies_per_station": anomalies_per_station,
+                "features_used": features,
+                "contamination_setting": contamination
+            }
+            print(f"Detected {anomaly_info['anomalies_found']} anomalies across {len(stations)} stations.")
+            return result, anomaly_info
+
+        except Exception as e:
+            print(f"Error during station anomaly detection: {e}")
+            return pd.DataFrame(), {"message": f"Error during station anomaly detection: {e}"}
+
+    def summary_statistics(self, df):
+        """
+        单遍计算报告所需的全部统计量（各要素的计数/和/均值/最值，以及降水日数、强降水日数）。
+        :param df: 输入的DataFrame。
+        :return: 要素名到统计量字典的字典。
+        """
+        stats = {}
+        for column in ('temperature', 'humidity', 'precipitation'):
+            if column in df.columns:
+                thresholds = PRECIPITATION_THRESHOLDS if column == 'precipitation' else ()
+                stats[column] = _column_statistics(df[column].to_numpy(dtype=float, na_value=np.nan), thresholds)
+        return stats
+
+    def get_data_summary(self, df, stats=None):
         """
         生成数据的文本摘要。
         :param df: 输入的DataFrame。
+        :param stats: (可选) summary_statistics 的结果，提供时不再扫描数据。
         :return: 文本摘要字符串。
         """
         if df.empty:
             return "数据为空，无法生成摘要。"
+        if stats is None:
+            stats = self.summary_statistics(df)
         
         summary_parts = []
-        if 'temperature' in df.columns:
-            avg_temp = df['temperature'].mean()
-            max_temp = df['temperature'].max()
-            min_temp = df['temperature'].min()
-            summary_parts.append(f"平均温度为 {avg_temp:.1f}°C (最高 {max_temp:.1f}°C, 最低 {min_temp:.1f}°C)。")
+        if 'temperature' in stats:
+            temperature = stats['temperature']
+            summary_parts.append(f"平均温度为 {temperature['mean']:.1f}°C (最高 {temperature['max']:.1f}°C, 最低 {temperature['min']:.1f}°C)。")
         
-        if 'humidity' in df.columns:
-            avg_humidity = df['humidity'].mean()
-            summary_parts.append(f"平均湿度为 {avg_humidity:.1f}%。")
-
-        if 'precipitation' in df.columns:
-            total_precipitation = df['precipitation'].sum()
-            rainy_days = df[df['precipitation'] > 0].shape[0]
-            summary_parts.append(f"总降水量为 {total_precipitation:.1f}mm，共有 {rainy_days} 个降水日。")
+        if 'humidity' in stats:
+            summary_parts.append(f"平均湿度为 {stats['humidity']['mean']:.1f}%。")
+
+        if 'precipitation' in stats:
+            precipitation = stats['precipitation']
+            summary_parts.append(f"总降水量为 {precipitation['sum']:.1f}mm，共有 {precipitation['above'][0]} 个降水日。")
             
         if not summary_parts:
             return "数据中缺少可分析的关键气象指标。"
             
         return " ".join(summary_parts)
 
-    def generate_insights_report(self, df, use_openai=False, custom_prompt=None):
+    def _template_report(self, df, stats):
         """
-        生成关于气象数据的洞察报告。
-        如果配置了OpenAI API且use_openai为True，则尝试调用GPT生成。
-        否则，使用基于模板的报告。
-        :param df: 输入的DataFrame。
-        :param use_openai: 是否尝试使用OpenAI API。
-        :param custom_prompt: (可选) 用户提供的自定义OpenAI prompt。
-        :return: 文本格式的洞察报告。
+        生成报告中不依赖大模型的部分。
+        :param stats: summary_statistics 的结果。
+        :return: (报告文本, 数据摘要, 异常数据)
         """
-        if df.empty:
-            return "数据为空，无法生成洞察报告。"
-
-        basic_summary = self.get_data_summary(df)
-        anomalies_df, anomaly_info = self.detect_anomalies(df.copy()) # 使用副本以避免修改原df
+        basic_summary = self.get_data_summary(df, stats)
+        anomalies_df, anomaly_info = self.detect_anomalies(df, inplace=False) # 不修改原df，也不复制整个df
 
         report = f"## 气象数据AI分析报告\n\n"
         report += f"### 1. 数据摘要\n{basic_summary}\n\n"
@@ -137,45 +420,225 @@ class WeatherAIAnalyzer:
             report += f"异常检测过程中发生错误: {anomaly_info['message']}\n"
         else:
             report += "根据当前分析，未检测到显著的异常天气模式。\n"
-        
-        # OpenAI 集成部分 (占位)
-        if use_openai and self.openai_api_key:
-            # 此处为调用OpenAI API的示例逻辑，实际使用需要安装openai库并配置好API密钥
-            # prompt = f"基于以下气象数据摘要和异常分析，生成一份专业的洞察报告：\n摘要：{basic_summary}\n异常：{anomalies_df.to_string() if not anomalies_df.empty else '无显著异常'}\n请分析潜在的趋势、模式和值得注意的方面。"
-            # if custom_prompt:
-            #    prompt = custom_prompt
-            # try:
-            #     response = openai.Completion.create(
-            #         engine="text-davinci-003", # 或其他合适的模型
-            #         prompt=prompt,
-            #         max_tokens=300
-            #     )
-            #     ai_insight = response.choices[0].text.strip()
-            #     report += f"\n### 3. OpenAI 智能洞察\n{ai_insight}\n"
-            # except Exception as e:
-            #     report += f"\n### 3. OpenAI 智能洞察\n调用OpenAI API失败: {e}\n"
-            report += f"\n### 3. OpenAI 智能洞察\n(OpenAI集成占位符：若配置API Key并启用，此处将显示GPT生成的洞察。)\n"
-        else:
-            report += f"\n### 3. 智能洞察\n(AI洞察功能当前使用模板生成。配置OpenAI API可获取更深入分析。)\n"
-            # 添加一些基于规则的简单洞察
-            if 'temperature' in df.columns and df['temperature'].mean() > 25:
-                report += "- 夏季平均温度较高，可能存在热浪风险。\n"
-            if 'precipitation' in df.columns and df[df['precipitation'] > 20].shape[0] > 3:
-                 report += "- 存在数个强降水日，需关注可能的内涝风险。\n"
-
-        report += "\n--- \n报告生成时间: " + pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+        return report, basic_summary, anomalies_df
+
+    def _build_insight_prompt(self, df, basic_summary, anomalies_df, custom_prompt=None):
+        """
+        构造发送给大模型的 prompt。
+        数据和异常先压缩为固定大小的统计摘要（见 prompt_digest），prompt 长度不随数据量增长。
+        """
+        if custom_prompt:
+            return custom_prompt
+        digest = format_digest(build_digest(df, anomalies_df))
+        return (f"基于以下气象数据摘要和异常分析，生成一份专业的洞察报告：\n摘要：{basic_summary}\n"
+                f"统计摘要：\n{digest}\n请分析潜在的趋势、模式和值得注意的方面。")
+
+    def _rule_based_insights(self, stats):
+        """模板模式下基于规则的简单洞察（使用 summary_statistics 的结果）"""
+        report = f"\n### 3. 智能洞察\n(AI洞察功能当前使用模板生成。配置OpenAI API可获取更深入分析。)\n"
+        if 'temperature' in stats and stats['temperature']['mean'] > 25:
+            report += "- 夏季平均温度较高，可能存在热浪风险。\n"
+        if 'precipitation' in stats and stats['precipitation']['above'][20] > 3:
+             report += "- 存在数个强降水日，需关注可能的内涝风险。\n"
         return report
 
-    def predict_future_weather(self, df, days_to_predict=7):
+    def generate_insights_report(self, df, use_openai=False, custom_prompt=None):
+        """
+        生成关于气象数据的洞察报告。
+        如果配置了OpenAI API（或传入了 llm_client）且use_openai为True，则调用大模型生成智能洞察。
+        否则，使用基于模板的报告。
+        :param df: 输入的DataFrame。
+        :param use_openai: 是否尝试使用OpenAI API。
+        :param custom_prompt: (可选) 用户提供的自定义OpenAI prompt。
+        :return: 文本格式的洞察报告。
+        """
+        return self.generate_insights_reports({None: df}, use_openai=use_openai, custom_prompt=custom_prompt)[None]
+
+    def generate_insights_reports(self, datasets, use_openai=False, custom_prompt=None):
+        """
+        批量生成多个站点/时段的洞察报告。
+        所有报告的大模型请求合并后并发发送（相同的 prompt 只请求一次，已缓存的 prompt 不再请求）。
+        :param datasets: 名称到DataFrame的字典，如 {站点ID: 该站点数据}。
+        :param use_openai: 是否尝试使用OpenAI API。
+        :param custom_prompt: (可选) 用户提供的自定义OpenAI prompt，所有报告共用。
+        :return: 名称到报告文本的字典。
+        """
+        llm_client = self._get_llm_client() if use_openai else None
+        reports, prompts = {}, {}
+        for name, df in datasets.items():
+            if df.empty:
+                continue
+            stats = self.summary_statistics(df)
+            report, basic_summary, anomalies_df = self._template_report(df, stats)
+            if llm_client is not None:
+                prompts[name] = self._build_insight_prompt(df, basic_summary, anomalies_df, custom_prompt)
+            else:
+                report += self._rule_based_insights(stats)
+            reports[name] = report
+
+        if prompts:
+            try:
+                insights = llm_client.generate_many(list(prompts.values()))
+            except Exception as e:  # 如未安装openai
+                insights = [e] * len(prompts)
+            for name, insight in zip(prompts, insights):
+                if isinstance(insight, BaseException):
+                    reports[name] += f"\n### 3. OpenAI 智能洞察\n调用OpenAI API失败: {insight}\n"
+                else:
+                    reports[name] += f"\n### 3. OpenAI 智能洞察\n{insight}\n"
+
+        timestamp = "\n--- \n报告生成时间: " + pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+        return {name: reports[name] + timestamp if name in reports else "数据为空，无法生成洞察报告。"
+                for name in datasets}
+
+    def predict_future_weather(self, df, days_to_predict=7, station_col='station_id'):
         """
-        预测未来天气 (占位符)。
-        :param df: 输入的历史数据DataFrame。
+        预测未来天气。
+        使用季节谐波回归 + 梯度提升残差模型（见 forecaster.WeatherForecaster），
+        对所有站点和所有预测步长批量预测。预测器按 forecast_horizon 训练一次（days_to_predict 更大时按其训练），
+        按数据指纹缓存，配置了 model_dir 时同时持久化；不同的 days_to_predict 只截取结果，不重新训练。
+        :param df: 输入的历史数据DataFrame，可包含多个站点。
         :param days_to_predict: 需要预测的天数。
-        :return: 预测结果或提示信息。
+        :param station_col: 站点ID列名，数据中没有该列时视为单站点。
+        :return: 预测结果DataFrame（date、horizon 及各要素预测值，多站点时包含站点列）；无法预测时为空DataFrame。
+        """
+        targets = [target for target in FORECAST_TARGETS if target in df.columns]
+        if df.empty or 'date' not in df.columns or not targets:
+            print("Error: DataFrame is empty or missing required columns for forecasting.")
+            return pd.DataFrame()
+
+        key_columns = ['date'] + targets + ([station_col] if station_col in df.columns else [])
+        fingerprint = self._data_fingerprint(df[key_columns])
+        config_key = ('forecaster', tuple(targets), station_col)
+        cache_key = config_key + (fingerprint,)
+        entry = self._cache_get(cache_key)
+        if entry is not None and entry['forecaster'].horizon < days_to_predict:
+            entry = None
+        horizon = max(days_to_predict, self.forecast_horizon)
+        path = self._model_path((config_key, horizon, fingerprint), prefix="forecaster") if self.model_dir else None
+
+        if entry is None:
+            if path and os.path.exists(path):
+                forecaster = WeatherForecaster.load(path)
+            else:
+                try:
+                    forecaster = WeatherForecaster(targets=targets, horizon=horizon,
+                                                   station_col=station_col).fit(df)
+                except Exception as e:
+                    print(f"Error during forecasting: {e}")
+                    return pd.DataFrame()
+                if path:
+                    os.makedirs(self.model_dir, exist_ok=True)
+                    forecaster.save(path)
+            entry = {'fingerprint': fingerprint, 'forecaster': forecaster}
+            self._cache_put(cache_key, entry)
+
+        return entry['forecaster'].predict(df, horizon=days_to_predict)
+
+class StreamingAnomalyDetector:
+    """
+    面向实时观测流的在线异常检测器。
+    维护最近 window 条记录的滑动窗口，用可增删的Welford算法更新窗口均值和方差，
+    每条新记录以常数时间计算z分数。输出与 detect_anomalies 相同的
+    anomaly_score（小于0表示异常）和 is_anomaly（-1 异常，1 正常）。
+    """
+
+    def __init__(self, features=['temperature', 'humidity', 'precipitation', 'wind_speed'], window=720, z_threshold=3.5, min_periods=30, min_std=1e-6):
+        """
+        :param features: 参与检测的特征列表。
+        :param window: 滑动窗口长度（记录数），至少为2。
+        :param z_threshold: 任一特征的|z|超过该值即判为异常。
+        :param min_periods: 窗口中少于该记录数时只积累数据，不判定异常（不能超过 window）。
+        :param min_std: 计算z分数时的标准差下限。窗口内没有波动的特征（如连续无降水）出现不同的值时判为异常。
         """
-        # 实际的预测模型会复杂得多，这里仅作占位
-        # 例如，可以使用ARIMA, Prophet等时序模型
-        return f"未来 {days_to_predict} 天的天气预测功能正在开发中。敬请期待！"
+        if window < 2:
+            raise ValueError(f"window 至少为2: {window}")
+        if min_periods > window:
+            raise ValueError(f"min_periods 不能超过 window（{min_periods} > {window}），否则检测器始终处于预热阶段")
+        self.features = list(features)
+        self.window = window
+        self.z_threshold = z_threshold
+        self.min_periods = max(2, min_periods)
+        self.min_std = min_std
+        self._buffer = np.zeros((window, len(self.features)))
+        self._pos = 0
+        self._n = 0
+        self._mean = np.zeros(len(self.features))
+        self._m2 = np.zeros(len(self.features))
+        self._updates = 0
+
+    def _add(self, x):
+        """向窗口加入一条记录（窗口已满时先移除最旧的记录）"""
+        if self._n == self.window:
+            old = self._buffer[self._pos]
+            self._n -= 1
+            delta = old - self._mean
+            self._mean -= delta / self._n
+            self._m2 -= delta * (old - self._mean)
+        self._buffer[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+        self._n += 1
+        delta = x - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (x - self._mean)
+        self._updates += 1
+        if self._updates % self.window == 0:
+            # 定期按窗口内容重算，消除增删累积的浮点误差（均摊仍为常数时间）
+            values = self._buffer[:self._n]
+            self._mean = values.mean(axis=0)
+            self._m2 = ((values - self._mean) ** 2).sum(axis=0)
+
+    def update(self, record):
+        """
+        对一条新到达的记录打分并加入窗口。
+        :param record: 包含各特征值的字典或Series。
+        :return: (anomaly_score, is_anomaly)，预热阶段分数为 NaN。
+        """
+        x = np.array([record[f] for f in self.features], dtype=float)
+        missing = np.isnan(x)
+
+        if self._n < self.min_periods:
+            # 预热阶段还没有可靠的窗口均值，含缺失值的记录不入窗
+            if not missing.any():
+                self._add(x)
+            return np.nan, 1
+        x[missing] = self._mean[missing]  # 与批量检测一致，缺失值按均值处理
+
+        std = np.sqrt(np.maximum(self._m2, 0) / (self._n - 1))
+        z = np.abs(x - self._mean) / np.maximum(std, self.min_std)
+        score = 1.0 - z.max() / self.z_threshold
+        # 异常值截断后再入窗，避免单个极端值拉大窗口方差。
+        # 没有波动的特征不截断：截断范围为0时新值都会被截成均值，窗口将永远无法恢复方差
+        limit = self.z_threshold * std
+        clipped = np.clip(x, self._mean - limit, self._mean + limit)
+        self._add(np.where(std > self.min_std, clipped, x))
+        return score, (-1 if score < 0 else 1)
+
+    def process(self, df):
+        """
+        按时间顺序逐条处理一批新记录，并在df中写入 anomaly_score 与 is_anomaly 列。
+        :param df: 新到达的观测数据。
+        :return: (anomalies_df, info_dict)，与 WeatherAIAnalyzer.detect_anomalies 的返回格式一致。
+        """
+        if df.empty or not all(feature in df.columns for feature in self.features):
+            return pd.DataFrame(), {"message": "Data is empty or features are missing."}
+
+        values = df[self.features].to_numpy(dtype=float)
+        scores = np.empty(len(values))
+        flags = np.empty(len(values), dtype=int)
+        for i, row in enumerate(values):
+            scores[i], flags[i] = self.update(dict(zip(self.features, row)))
+
+        df['anomaly_score'] = scores
+        df['is_anomaly'] = flags
+        anomalies_df = df[df['is_anomaly'] == -1].copy()
+        anomaly_info = {
+            "total_points_analyzed": len(df),
+            "anomalies_found": len(anomalies_df),
+            "features_used": self.features,
+            "window_size": self._n
+        }
+        return anomalies_df, anomaly_info
 
 if __name__ == "__main__":
     # 创建一个简单的数据样本进行测试
@@ -196,23 +659,35 @@ if __name__ == "__main__":
     analyzer = WeatherAIAnalyzer()
 
     print("--- 异常检测测试 ---")
-    anomalies, info = analyzer.detect_anomalies(sample_df.copy()) # 使用副本
+    anomalies, info = analyzer.detect_anomalies(sample_df, inplace=False) # 不修改原数据
     if not anomalies.empty:
         print("检测到的异常数据:")
         print(anomalies[['date', 'temperature', 'humidity', 'precipitation', 'is_anomaly', 'anomaly_score']])
     else:
         print("未检测到异常或检测出错。")
     print(f"异常检测信息: {info}")
+    print("\n--- 流式异常检测测试（连续无降水后出现强降水）---")
+    detector = StreamingAnomalyDetector(features=['precipitation'], window=100)
+    stream = pd.DataFrame({'precipitation': [0.0] * 200 + [500.0, 500.0, 0.0]})
+    stream_anomalies, stream_info = detector.process(stream)
+    # 第二次仍需判为异常：窗口方差为0时第一次的值不能被截断成均值
+    assert (stream['is_anomaly'].iloc[200:202] == -1).all(), \
+        f"无降水期后的强降水未被判为异常: {stream['anomaly_score'].iloc[200:202].tolist()}"
+    # 窗口方差恢复后，回到无降水不应再被判为异常
+    assert stream['is_anomaly'].iloc[202] == 1, "强降水后窗口方差未恢复"
+    assert stream_info['anomalies_found'] == 2, f"异常个数错误: {stream_info}"
+    print(stream_anomalies[['precipitation', 'anomaly_score', 'is_anomaly']])
+
     print("\n--- 数据摘要测试 ---")
     summary = analyzer.get_data_summary(sample_df)
     print(summary)
 
     print("\n--- 洞察报告测试 (模板) ---")
-    report_template = analyzer.generate_insights_report(sample_df.copy()) # 使用副本
+    report_template = analyzer.generate_insights_report(sample_df) # 不会修改原数据
     print(report_template)
 
     # print("\n--- 洞察报告测试 (尝试OpenAI，如果配置了API KEY) ---")
-    # report_openai = analyzer.generate_insights_report(sample_df.copy(), use_openai=True)
+    # report_openai = analyzer.generate_insights_report(sample_df, use_openai=True)
     # print(report_openai)
 
     print("\n--- 未来天气预测测试 ---")
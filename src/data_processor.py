@@ -6,14 +6,107 @@
 
 import pandas as pd
 import numpy as np
+import io
 import os
+import sys
 from datetime import datetime, timedelta
 
+try:
+    from storage import get_storage
+    from memmap_store import SUFFIX as MEMMAP_SUFFIX, MemmapDataset, write_memmap
+    from online_stats import RunningStatistics
+    from aggregates import AggregateCube
+    from features import MEASUREMENTS, FEATURE_DTYPES, ROLLING_WINDOWS, derive_features, compact_dtypes
+    from schema import COMPACT_MODES, compact_frame, encode_scaled, decode_scaled, scaled_columns, memory_footprint
+except ImportError:  # 以 src.data_processor 方式导入时
+    from .storage import get_storage
+    from .memmap_store import SUFFIX as MEMMAP_SUFFIX, MemmapDataset, write_memmap
+    from .online_stats import RunningStatistics
+    from .aggregates import AggregateCube
+    from .features import MEASUREMENTS, FEATURE_DTYPES, ROLLING_WINDOWS, derive_features, compact_dtypes
+    from .schema import COMPACT_MODES, compact_frame, encode_scaled, decode_scaled, scaled_columns, memory_footprint
+
+
+def _generate_station_block(seed_sequences, station_ids, dates, categories, storage=None, path=None, compact=None,
+                            time_block=None):
+    """
+    生成一组站点的合成观测数据（供进程池调用的模块级函数）。
+    每个站点使用各自的 SeedSequence，结果与进程数以及站点如何分组无关。
+    compact 为紧凑模式（见 WeatherDataProcessor），'int16' 时以放大10倍的整数落盘。
+    time_block 不为 None 时 dates 是单个站点的第 time_block 个时间片：站点气候参数仍由站点的 SeedSequence 决定，
+    观测噪声使用由站点序列派生的子序列。
+    """
+    n_stations, n_times = len(station_ids), len(dates)
+    shape = (n_stations, n_times)
+    temperature = np.empty(shape)
+    humidity = np.empty(shape)
+    precipitation = np.empty(shape)
+    wind_speed = np.empty(shape)
+    temp_base = np.empty((n_stations, 1))
+    temp_amplitude = np.empty((n_stations, 1))
+    diurnal_amplitude = np.empty((n_stations, 1))
+    humidity_base = np.empty((n_stations, 1))
+    
+    for i, seed_seq in enumerate(seed_sequences):
+        rng = np.random.Generator(np.random.PCG64(seed_seq))
+        # 站点气候参数
+        temp_base[i] = rng.normal(15, 5)
+        temp_amplitude[i] = rng.uniform(5, 15)
+        diurnal_amplitude[i] = rng.uniform(2, 6)
+        humidity_base[i] = rng.uniform(50, 80)
+        if time_block is not None:
+            child = np.random.SeedSequence(seed_seq.entropy, spawn_key=seed_seq.spawn_key + (time_block,))
+            rng = np.random.Generator(np.random.PCG64(child))
+        # 观测噪声
+        temperature[i] = rng.normal(0, 3, n_times)
+        humidity[i] = rng.standard_normal(n_times)
+        precipitation[i] = np.where(rng.random(n_times) < 0.7, 0, rng.exponential(scale=3, size=n_times))
+        wind_speed[i] = rng.gamma(2, 2, n_times)
+    
+    # 季节与日变化在所有站点上向量化计算
+    fraction_of_day = (dates.hour.to_numpy() + dates.minute.to_numpy() / 60) / 24
+    day_of_year = dates.dayofyear.to_numpy() + fraction_of_day
+    seasonal = np.sin(2 * np.pi * day_of_year / 365.25)
+    diurnal = np.sin(2 * np.pi * (fraction_of_day - 0.375)) if fraction_of_day.any() else 0
+    temperature += temp_base + temp_amplitude * seasonal + diurnal_amplitude * diurnal
+    humidity = np.clip(humidity_base + 15 * humidity, 0, 100)
+    
+    data = pd.DataFrame({
+        'station_id': pd.Categorical(np.repeat(station_ids, n_times), categories=categories),
+        'date': np.tile(dates.to_numpy(), n_stations),
+        'temperature': np.round(temperature.ravel(), 1),
+        'humidity': np.round(humidity.ravel(), 1),
+        'precipitation': np.round(precipitation.ravel(), 1),
+        'wind_speed': np.round(wind_speed.ravel(), 1)
+    })
+    
+    if compact:
+        compact_frame(data, inplace=True)
+    if path is None:
+        return data
+    storage.save(encode_scaled(data) if compact == 'int16' else data, path)
+    return path
+
+
 class WeatherDataProcessor:
-    def __init__(self):
+    def __init__(self, storage_format='csv', compact=None):
+        """
+        :param storage_format: 数据落盘格式，'csv'、'parquet'（压缩列存）、'feather'（内存映射热加载）
+                               或 'memmap'（按列内存映射 + 站点/日期索引，适合比内存大的数据集）
+        :param compact: 紧凑模式。None 表示不转换原始数据；'float32' 时观测值为 float32、季节为分类类型、
+                        站点ID字典编码；'int16' 在此基础上把观测值以放大10倍的 int16（0.1°C、0.1mm、0.1%）落盘。
+                        清洗（clean_data、分块清洗）和 load_data 无论是否启用都会把观测值转换为 float32、季节转换为
+                        分类类型，因此 'float32' 模式对清洗后数据的作用只是站点ID字典编码，主要节省的是原始数据
+                        （generate_* 的返回值和 raw 阶段文件）的内存
+        """
+        if compact is not None and compact not in COMPACT_MODES:
+            raise ValueError(f"不支持的紧凑模式: {compact}，可选: {COMPACT_MODES}")
+        self.compact = compact
         self.data_dir = "data"
         self.raw_dir = os.path.join(self.data_dir, "raw")
         self.processed_dir = os.path.join(self.data_dir, "processed")
+        self.storage = get_storage(storage_format)
+        self.running_stats = RunningStatistics()
         self._create_directories()
     
     def _create_directories(self):
@@ -50,45 +143,285 @@ class WeatherDataProcessor:
             'wind_speed': np.round(wind_speed, 1)
         })
         
+        if self.compact:
+            compact_frame(data, inplace=True)
+        
         # 保存原始数据
-        data.to_csv(os.path.join(self.raw_dir, 'weather_data.csv'), index=False)
+        self.save_data(data, 'weather_data', stage='raw')
         return data
     
-    def clean_data(self, df):
-        """数据清洗"""
-        df_clean = df.copy()
+    def generate_station_data(self, n_stations=10, start_date='2023-01-01', end_date='2023-12-31',
+                              freq='h', seed=42, partition_rows=1_000_000, output_dir=None, n_jobs=1):
+        """
+        生成多站点、小时级（或更高频率）的合成气象数据，用于压力测试
+        :param n_stations: 站点数量
+        :param freq: 时间分辨率，如 'D'、'h'、'10min'
+        :param seed: 主随机种子，通过 SeedSequence.spawn 为每个站点派生独立的随机数生成器
+        :param partition_rows: 每个分区的最大行数，决定单个分区的峰值内存。单个站点的行数超过该值时
+                               按时间切分为多个分区，此时观测噪声与 partition_rows 有关
+        :param output_dir: 输出目录；为 None 时在内存中返回完整的DataFrame
+        :param n_jobs: 并行生成分区的进程数
+        :return: DataFrame（未指定 output_dir 时）或分区文件路径列表
+        """
+        if n_jobs < 1:
+            raise ValueError(f"n_jobs 必须为正整数: {n_jobs}")
+        if partition_rows < 1:
+            raise ValueError(f"partition_rows 必须为正整数: {partition_rows}")
+        dates = pd.date_range(start=start_date, end=end_date, freq=freq)
+        station_ids = np.array([f"ST{i:05d}" for i in range(n_stations)])
+        seed_sequences = np.random.SeedSequence(seed).spawn(n_stations)
+        
+        # 每个分区为 (站点切片, 日期, 时间片序号)
+        partitions = []
+        if len(dates) <= partition_rows:
+            stations_per_partition = max(1, partition_rows // max(len(dates), 1))
+            for start in range(0, n_stations, stations_per_partition):
+                partitions.append((slice(start, start + stations_per_partition), dates, None))
+        else:
+            for i in range(n_stations):
+                for block, start in enumerate(range(0, len(dates), partition_rows)):
+                    partitions.append((slice(i, i + 1), dates[start:start + partition_rows], block))
+        
+        tasks = []
+        for part, (stations, part_dates, time_block) in enumerate(partitions):
+            path = None
+            if output_dir is not None:
+                path = os.path.join(output_dir, f"part-{part:05d}{self.storage.suffix}")
+            tasks.append((seed_sequences[stations], station_ids[stations], part_dates, station_ids,
+                          self.storage, path, self.compact, time_block))
+        
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+        
+        if n_jobs == 1:
+            results = [_generate_station_block(*task) for task in tasks]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(_generate_station_block, *zip(*tasks)))
         
+        if output_dir is not None:
+            return results
+        return pd.concat(results, ignore_index=True)
+    
+    def _apply_cleaning_rules(self, df, hemisphere='north', rolling_windows=ROLLING_WINDOWS):
+        """对DataFrame原地应用清洗规则（异常值裁剪与衍生特征）"""
         # 温度异常值处理
-        df_clean['temperature'] = df_clean['temperature'].clip(-50, 50)
+        if 'temperature' in df.columns:
+            df['temperature'] = df['temperature'].clip(-50, 50)
         
         # 湿度范围限制
-        df_clean['humidity'] = df_clean['humidity'].clip(0, 100)
+        if 'humidity' in df.columns:
+            df['humidity'] = df['humidity'].clip(0, 100)
         
         # 降水量不能为负
-        df_clean['precipitation'] = df_clean['precipitation'].clip(0, None)
+        if 'precipitation' in df.columns:
+            df['precipitation'] = df['precipitation'].clip(0, None)
         
         # 添加衍生特征
-        df_clean['month'] = pd.to_datetime(df_clean['date']).dt.month
-        df_clean['season'] = pd.cut(
-            df_clean['month'], 
-            bins=[0, 3, 6, 9, 12], 
-            labels=['冬季', '春季', '夏季', '秋季'],
-            include_lowest=True
-        )
+        return derive_features(df, inplace=True, hemisphere=hemisphere, rolling_windows=rolling_windows)
+    
+    def derive_features(self, df, inplace=False, hemisphere='north', rolling_windows=ROLLING_WINDOWS):
+        """
+        计算衍生特征：month(int8)、day_of_year(int16)、season(分类，区分南北半球)、温度滑动平均(float32)，
+        观测要素转换为 float32
+        :param inplace: 是否直接修改 df
+        :param hemisphere: 'north' 或 'south'；数据中有 latitude 列时按各行纬度判断
+        :return: 添加了衍生特征的DataFrame
+        """
+        return derive_features(df, inplace=inplace, hemisphere=hemisphere, rolling_windows=rolling_windows)
+    
+    def clean_data(self, df, inplace=False, hemisphere='north'):
+        """
+        数据清洗
+        :param inplace: 是否直接在 df 上清洗（不复制整个DataFrame，适合大数据集）
+        :param hemisphere: 数据所在半球，决定季节划分
+        """
+        df_clean = self._apply_cleaning_rules(df if inplace else df.copy(), hemisphere=hemisphere)
         
         # 保存清洗后的数据
-        df_clean.to_csv(os.path.join(self.processed_dir, 'weather_data_clean.csv'), index=False)
+        self.save_data(df_clean, 'weather_data_clean', stage='processed')
         return df_clean
     
-    def get_statistics(self, df):
-        """获取数据统计信息"""
-        stats = {
-            'basic_stats': df.describe(),
-            'missing_values': df.isnull().sum(),
-            'data_types': df.dtypes,
-            'correlation': df.select_dtypes(include=[np.number]).corr()
-        }
-        return stats
+    def _data_path(self, name, stage):
+        """根据数据阶段和存储格式拼接文件路径"""
+        directory = self.raw_dir if stage == 'raw' else self.processed_dir
+        return os.path.join(directory, name + self.storage.suffix)
+    
+    def save_data(self, df, name, stage='processed'):
+        """
+        使用当前存储后端保存数据
+        :param name: 数据集名称（不含扩展名）
+        :param stage: 'raw' 或 'processed'
+        :return: 保存的文件路径
+        """
+        path = self._data_path(name, stage)
+        self.storage.save(encode_scaled(df) if self.compact == 'int16' else df, path)
+        return path
+    
+    def load_data(self, name='weather_data_clean', stage='processed', columns=None,
+                  start_date=None, end_date=None):
+        """
+        从当前存储后端加载数据，只读取需要的列和日期范围
+        :param columns: 需要的列，None 表示全部
+        :param start_date: 起始日期（含），Parquet 下推到行组过滤
+        :param end_date: 结束日期（含）
+        :return: DataFrame
+        """
+        path = self._data_path(name, stage)
+        if self.compact == 'int16' and columns is not None:
+            # 超出 int16 范围的列以原列名保存，按文件中实际的列名映射
+            columns = scaled_columns(columns, self.storage.columns(path))
+        df = self.storage.load(path, columns=columns,
+                               start_date=start_date, end_date=end_date)
+        df = decode_scaled(df.reset_index(drop=True))
+        if self.compact:
+            compact_frame(df, inplace=True)
+        # CSV不保存类型信息，恢复季节的分类类型和衍生特征的紧凑类型
+        return compact_dtypes(df)
+    
+    def iter_clean_chunks(self, source, chunksize=100_000):
+        """
+        分块读取CSV并逐块清洗
+        :param source: CSV文件路径或文件对象
+        :param chunksize: 每块的行数，峰值内存只与该值有关
+        :return: 逐块产出清洗后DataFrame的生成器
+        """
+        for chunk in pd.read_csv(source, chunksize=chunksize):
+            # 无法解析的日期记为缺失值，不影响其他行
+            chunk['date'] = pd.to_datetime(chunk['date'], errors='coerce')
+            # 滑动平均跨越块边界，分块时不计算
+            yield self._apply_cleaning_rules(chunk, rolling_windows=())
+    
+    def process_csv_in_chunks(self, input_path, output_path=None, chunksize=100_000):
+        """
+        流式处理大型CSV文件：分块清洗、追加写出，并累计增量统计信息
+        :param input_path: 原始CSV文件路径
+        :param output_path: 清洗后CSV的输出路径，默认写入 processed 目录
+        :param chunksize: 每块的行数
+        :return: 统计信息字典（行数、输出路径、入库时构建的 aggregate_cube，以及与 get_statistics 相同的统计项）
+        """
+        if output_path is None:
+            output_path = os.path.join(self.processed_dir, 'weather_data_clean.csv')
+        
+        stats = RunningStatistics()
+        cube = None
+        first_chunk = True
+        for chunk in self.iter_clean_chunks(input_path, chunksize=chunksize):
+            chunk.to_csv(output_path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+            first_chunk = False
+            stats.update(chunk)
+            cube = self._merge_cube(cube, chunk)
+        
+        result = {'rows': stats.n_rows, 'output_path': output_path, 'aggregate_cube': cube}
+        result.update(stats.summary())
+        return result
+    
+    def _merge_cube(self, cube, chunk):
+        """把一个数据块的聚合立方体合并到已有立方体中（分块入库时使用）"""
+        chunk_cube = self.build_aggregate_cube(chunk)
+        return chunk_cube if cube is None else cube.merge(chunk_cube)
+    
+    def convert_csv_to_memmap(self, input_path, output_path=None, chunksize=100_000):
+        """
+        流式清洗大型CSV并写成内存映射数据集，之后可用 open_memmap 按站点/日期范围随机读取
+        :param input_path: 原始CSV文件路径
+        :param output_path: 数据集目录，默认写入 processed 目录下的 weather_data_clean.wxmm
+        :param chunksize: 每块的行数，峰值内存只与该值有关
+        :return: 统计信息字典（与 process_csv_in_chunks 相同）
+        """
+        if output_path is None:
+            output_path = os.path.join(self.processed_dir, 'weather_data_clean' + MEMMAP_SUFFIX)
+        
+        stats = RunningStatistics()
+        cube = None
+        skipped = 0
+        
+        def chunks():
+            nonlocal cube, skipped
+            for chunk in self.iter_clean_chunks(input_path, chunksize=chunksize):
+                stats.update(chunk)
+                cube = self._merge_cube(cube, chunk)
+                missing = chunk['date'].isna()
+                if missing.any():
+                    # 日期缺失的行无法建立日期索引，计入统计信息但不写入数据集
+                    skipped += int(missing.sum())
+                    chunk = chunk[~missing].astype(FEATURE_DTYPES)
+                if self.compact:
+                    yield compact_frame(chunk, inplace=True)
+                else:
+                    # 各块推断出的类型可能不同（如某块没有缺失值时为整数），观测值统一为 float64
+                    yield chunk.astype({column: np.float64 for column in MEASUREMENTS if column in chunk.columns})
+        
+        write_memmap(chunks(), output_path, chunk_rows=chunksize)
+        if skipped:
+            print(f"跳过 {skipped} 行日期缺失的数据")
+        result = {'rows': stats.n_rows, 'output_path': output_path, 'aggregate_cube': cube}
+        result.update(stats.summary())
+        return result
+    
+    def open_memmap(self, name='weather_data_clean', stage='processed', path=None):
+        """
+        打开内存映射数据集（不读取数据），通过 slice / iter_chunks 按需取数
+        :param path: 数据集目录，None 表示按 name 和 stage 拼接
+        :return: MemmapDataset
+        """
+        if path is None:
+            directory = self.raw_dir if stage == 'raw' else self.processed_dir
+            path = os.path.join(directory, name + MEMMAP_SUFFIX)
+        return MemmapDataset(path)
+    
+    def to_compact(self, df, inplace=False):
+        """转换为紧凑的内存表示：观测值 float32、季节为分类类型、站点ID字典编码"""
+        return compact_frame(df, inplace=inplace)
+    
+    def memory_report(self, df):
+        """
+        统计DataFrame的内存占用，并与全部数值列为 float64、分类列为 object 字符串的表示对比（按列估算，不复制数据）
+        :return: 包含 columns、total_bytes、total_mb、baseline_mb、saving_ratio 的字典
+        """
+        report = memory_footprint(df)
+        baseline_bytes = df.memory_usage(index=True)['Index'] if len(df.columns) else 0
+        for column in df.columns:
+            values = df[column]
+            if pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype):
+                baseline_bytes += len(values) * 8
+            elif isinstance(values.dtype, pd.CategoricalDtype):
+                counts = values.value_counts(sort=False)
+                sizes = np.array([sys.getsizeof(str(value)) for value in counts.index])
+                baseline_bytes += len(values) * 8 + int((sizes * counts.to_numpy()).sum())
+            else:
+                baseline_bytes += report['columns'][column]['bytes']
+        report['baseline_mb'] = round(baseline_bytes / 1024 ** 2, 2)
+        report['saving_ratio'] = round(1 - report['total_bytes'] / baseline_bytes, 3) if baseline_bytes else 0.0
+        return report
+    
+    def update_statistics(self, df):
+        """
+        将新追加的观测数据计入累计统计量，代价只与新数据行数有关
+        :param df: 新增的观测数据
+        :return: 累计统计量对象
+        """
+        return self.running_stats.update(df)
+    
+    def get_statistics(self, df=None):
+        """
+        获取数据统计信息
+        :param df: 需要统计的DataFrame；为 None 时返回通过 update_statistics 累计的统计结果
+        :return: 包含 basic_stats、missing_values、data_types、correlation 的字典
+        """
+        if df is None:
+            return self.running_stats.summary()
+        return RunningStatistics.from_frame(df).summary()
+    
+    def build_aggregate_cube(self, df, station_col='station_id'):
+        """
+        构建 站点×年×月×季节 的预聚合立方体，季节/月度统计视图可直接由其汇总得到
+        :param df: 清洗后的DataFrame
+        :param station_col: 站点ID列名，数据中没有该列时视为单站点
+        :return: AggregateCube
+        """
+        return AggregateCube.build(df, station_col=station_col)
 
 if __name__ == "__main__":
     processor = WeatherDataProcessor()
@@ -96,4 +429,15 @@ if __name__ == "__main__":
     clean_data = processor.clean_data(data)
     stats = processor.get_statistics(clean_data)
     print("数据处理模块开发完成！")
-    print(f"数据形状: {clean_data.shape}")
\ No newline at end of file
+    print(f"数据形状: {clean_data.shape}")
+    
+    # 缺失日期：衍生特征为缺失值，不影响其他行的清洗
+    missing_date = data.head(10).assign(date=data['date'].head(10).astype(str))
+    missing_date.loc[3, 'date'] = None
+    missing_date.loc[5, 'date'] = 'bad'
+    cleaned = processor.clean_data(missing_date)
+    assert cleaned['month'].isna().sum() == 2 and cleaned['season'].isna().sum() == 2, "缺失日期的衍生特征应为缺失值"
+    assert cleaned['month'].notna().sum() == 8, "其他行的衍生特征不应受影响"
+    chunks = list(processor.iter_clean_chunks(io.StringIO(missing_date.to_csv(index=False)), chunksize=4))
+    assert sum(chunk['date'].isna().sum() for chunk in chunks) == 2, "分块读取时无法解析的日期应记为缺失值"
+    print("缺失日期清洗测试通过")
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+日期索引模块
+负责人：Person 2 (2001wzh)
+功能：为按日期排序的数据建立 int64 日偏移量和季节游程编码索引，
+     日期范围筛选变为二分查找切片，季节筛选变为按游程的向量化编码查找
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _to_day(value):
+    """把日期转换为自1970-01-01起的天数"""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+
+class DateIndex:
+    """日期 + 季节的快速筛选索引"""
+
+    def __init__(self, day_offsets, run_starts, run_codes, categories, order=None):
+        """
+        :param day_offsets: 升序排列的每行日偏移量（int64，自1970-01-01起的天数）
+        :param run_starts: 季节游程的起始位置（按日期排序后相同季节连续出现的行构成一个游程）
+        :param run_codes: 各游程的季节编码，-1 表示缺失
+        :param categories: 季节编码对应的取值
+        :param order: 原数据未按日期排序或有缺失日期时，排序位置到原行位置的映射；否则为 None
+        """
+        self.day_offsets = day_offsets
+        self.run_starts = run_starts
+        self.run_codes = run_codes
+        self.categories = list(categories)
+        self.order = order
+
+    @classmethod
+    def build(cls, df, date_col='date', season_col='season'):
+        """
+        扫描一遍数据建立索引。日期缺失（NaT）的行不进入索引，任何日期范围筛选都不包含这些行
+        :param df: 包含日期列和（可选）季节列的DataFrame
+        :return: DateIndex
+        """
+        dates = pd.to_datetime(df[date_col]).to_numpy().astype('datetime64[D]')
+        days = dates.astype(np.int64)
+        order = None
+        valid = ~np.isnat(dates)
+        if not valid.all():
+            order = np.flatnonzero(valid)
+            order = order[np.argsort(days[order], kind='stable')]
+            days = days[order]
+        elif len(days) > 1 and (np.diff(days) < 0).any():
+            order = np.argsort(days, kind='stable')
+            days = days[order]
+
+        if season_col in df.columns:
+            season = df[season_col]
+            if not isinstance(season.dtype, pd.CategoricalDtype):
+                season = season.astype('category')
+            categories = season.cat.categories
+            codes = season.cat.codes.to_numpy()
+            if order is not None:
+                codes = codes[order]
+        else:
+            categories = []
+            codes = np.full(len(days), -1, dtype=np.int8)
+
+        run_starts = np.concatenate([[0], np.flatnonzero(codes[1:] != codes[:-1]) + 1]) if len(codes) else \
+            np.empty(0, dtype=np.int64)
+        return cls(days, run_starts, codes[run_starts], categories, order)
+
+    def __len__(self):
+        return len(self.day_offsets)
+
+    @property
+    def min_date(self):
+        """最早日期（不含缺失日期），没有有效日期时为 None"""
+        return pd.Timestamp(self.day_offsets[0], unit='D').date() if len(self) else None
+
+    @property
+    def max_date(self):
+        """最晚日期（不含缺失日期），没有有效日期时为 None"""
+        return pd.Timestamp(self.day_offsets[-1], unit='D').date() if len(self) else None
+
+    def date_range(self, start_date=None, end_date=None):
+        """
+        二分查找日期范围（两端均包含）在排序后数据中的位置
+        :return: (起始位置, 结束位置)，左闭右开
+        """
+        lo = 0 if start_date is None else int(np.searchsorted(self.day_offsets, _to_day(start_date), side='left'))
+        hi = len(self) if end_date is None else int(np.searchsorted(self.day_offsets, _to_day(end_date), side='right'))
+        return lo, max(lo, hi)
+
+    def ranges(self, start_date=None, end_date=None, seasons=None):
+        """
+        计算满足筛选条件的行区间，代价只与区间内的季节游程数有关，与行数无关
+        :param seasons: 需要保留的季节，None 表示不按季节筛选
+        :return: (起始位置数组, 结束位置数组)，左闭右开，位置为排序后的位置
+        """
+        lo, hi = self.date_range(start_date, end_date)
+        if seasons is None or set(self.categories) <= set(seasons):
+            return np.array([lo]), np.array([hi])
+
+        # 编码 -1（缺失）取到查找表末尾的 False
+        selected = np.append(np.isin(self.categories, list(seasons)), False)
+        first = max(int(np.searchsorted(self.run_starts, lo, side='right')) - 1, 0)
+        last = int(np.searchsorted(self.run_starts, hi, side='left'))
+        starts = np.clip(self.run_starts[first:last], lo, hi)
+        ends = np.clip(np.append(self.run_starts[first + 1:last], hi), lo, hi)
+        keep = selected[self.run_codes[first:last]] & (ends > starts)
+        starts, ends = starts[keep].astype(np.int64), ends[keep].astype(np.int64)
+        if len(starts) == 0:
+            return starts, ends
+
+        # 合并首尾相接的区间（如同时选中相邻的两个季节）
+        breaks = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+        return starts[np.concatenate([[0], breaks])], ends[np.append(breaks - 1, len(ends) - 1)]
+
+    def positions(self, start_date=None, end_date=None, seasons=None):
+        """满足筛选条件的原数据行位置（升序日期顺序）"""
+        starts, ends = self.ranges(start_date, end_date, seasons)
+        lengths = ends - starts
+        total = int(lengths.sum())
+        # 把多个 [start, end) 区间展开成位置数组（向量化，不逐区间循环）
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        positions = np.arange(total, dtype=np.int64) + offsets
+        return positions if self.order is None else self.order[positions]
+
+    def take(self, df, start_date=None, end_date=None, seasons=None):
+        """
+        按日期范围和季节筛选建立索引时所用的DataFrame。
+        结果为单个连续区间时直接返回切片，不复制数据。
+        """
+        starts, ends = self.ranges(start_date, end_date, seasons)
+        if self.order is None and len(starts) <= 1:
+            return df.iloc[int(starts[0]):int(ends[0])] if len(starts) else df.iloc[0:0]
+        return df.take(self.positions(start_date, end_date, seasons))
@@ -0,0 +1,100 @@
+"""
+时间序列降采样模块
+负责人：Person 3 (可视化工程师)
+功能：在绘图前把长时间序列压缩到固定的点数预算（LTTB / 分桶最小最大值），
+     使图表数据量取决于屏幕宽度而不是数据长度
+"""
+
+import numpy as np
+import pandas as pd
+
+# 默认点数预算：约为常见图表宽度（像素）的两倍
+DEFAULT_MAX_POINTS = 2000
+
+
+def _as_float(x):
+    """把日期等横坐标转换为可计算的浮点数"""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标。
+    首尾点固定保留，其余每个桶选出与相邻桶构成最大三角形面积的点，能较好地保留视觉形状。
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+    y = np.where(np.isnan(y), np.nanmean(y), y)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # 下一个桶的平均点作为三角形的第三个顶点
+        next_start, next_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax_indices(x, y, n_out):
+    """
+    分桶最小/最大值降采样（完全向量化），每个桶保留最小值和最大值所在的点，保证峰值不丢失。
+    """
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    y = np.where(np.isnan(y), np.nanmean(y), y)
+    n_buckets = max(1, n_out // 2)
+    buckets = np.arange(n) * n_buckets // n
+    order = np.lexsort((y, buckets))
+    bucket_start = np.searchsorted(buckets[order], np.arange(n_buckets))
+    bucket_end = np.append(bucket_start[1:], n) - 1
+    return np.unique(np.concatenate([order[bucket_start], order[bucket_end], [0, n - 1]]))
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb_indices,
+    'minmax': minmax_indices,
+}
+
+
+def downsample(data, x_col, y_col, max_points=DEFAULT_MAX_POINTS, method='lttb'):
+    """
+    按点数预算对DataFrame降采样，返回保留的行（其余列随之保留，便于叠加移动平均线等）。
+    :param data: 按横坐标排序的DataFrame
+    :param x_col: 横坐标列（通常为 date）
+    :param y_col: 决定保留哪些点的纵坐标列
+    :param max_points: 点数预算，None 表示不降采样
+    :param method: 'lttb' 或 'minmax'
+    :return: 降采样后的DataFrame
+    """
+    if max_points is None or len(data) <= max_points:
+        return data
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"不支持的降采样方法: {method}，可选: {list(DOWNSAMPLERS)}")
+    idx = DOWNSAMPLERS[method](data[x_col].to_numpy(), data[y_col].to_numpy(), max_points)
+    return data.iloc[idx]
+
+
+def binned_histogram(values, bins=30):
+    """
+    预先计算直方图，只把各分箱的中心和计数交给绘图库，而不是全部原始值。
+    :return: (分箱中心, 计数, 分箱宽度)
+    """
+    values = pd.Series(values).dropna().to_numpy(dtype=float)
+    counts, edges = np.histogram(values, bins=bins)
+    return (edges[:-1] + edges[1:]) / 2, counts, np.diff(edges)
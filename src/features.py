@@ -0,0 +1,115 @@
+"""
+特征衍生模块
+负责人：Person 2 (2001wzh)
+功能：在一个阶段内一次性计算月份、年内日序、季节（区分南北半球）和滑动平均等衍生特征，
+     使用紧凑的数据类型，下游的分析与可视化模块直接复用这些列而不再重复解析日期
+"""
+
+import numpy as np
+import pandas as pd
+
+MEASUREMENTS = ['temperature', 'humidity', 'precipitation', 'wind_speed']
+SEASON_LABELS = ['冬季', '春季', '夏季', '秋季']
+SEASON_DTYPE = pd.CategoricalDtype(SEASON_LABELS, ordered=True)
+# 北半球各月份（下标为月份）对应的季节编码：1-3月冬季、4-6月春季、7-9月夏季、10-12月秋季
+MONTH_TO_SEASON = np.array([0, 0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3], dtype=np.int8)
+# 各衍生列的紧凑类型
+FEATURE_DTYPES = {'month': np.int8, 'day_of_year': np.int16}
+# 日期有缺失值（NaT）时使用的可空类型
+NULLABLE_FEATURE_DTYPES = {'month': 'Int8', 'day_of_year': 'Int16'}
+ROLLING_WINDOWS = (7, 30)
+
+
+def season_from_month(month, southern=False):
+    """
+    按月份计算季节（向量化查表）
+    :param month: 月份数组（1-12），可以包含缺失值（日期为 NaT 时）
+    :param southern: 是否为南半球，可为布尔值或与 month 等长的布尔数组；南半球的季节与北半球相差半年
+    :return: 有序分类类型的季节 Categorical，缺失月份对应缺失的季节
+    """
+    missing = None
+    if not (isinstance(month, np.ndarray) and month.dtype.kind in 'iu'):
+        month = pd.array(month, dtype='Int64')
+        missing = month.isna()
+        month = month.to_numpy(dtype=np.int64, na_value=0)
+    codes = MONTH_TO_SEASON[np.asarray(month, dtype=np.int64)]
+    codes = np.where(southern, (codes + 2) % 4, codes).astype(np.int8)
+    if missing is not None:
+        codes[missing] = -1
+    return pd.Categorical.from_codes(codes, dtype=SEASON_DTYPE)
+
+
+def add_rolling_features(df, windows=ROLLING_WINDOWS, station_col='station_id'):
+    """
+    原地添加温度滑动平均列 temp_ma{窗口}（float32），多站点数据按站点分别计算
+    :param windows: 滑动窗口大小（行数）
+    :return: df
+    """
+    if 'temperature' not in df.columns:
+        return df
+    for window in windows:
+        if station_col in df.columns:
+            rolling = df.groupby(station_col, observed=True, sort=False)['temperature'] \
+                .transform(lambda s: s.rolling(window=window).mean())
+        else:
+            rolling = df['temperature'].rolling(window=window).mean()
+        df[f'temp_ma{window}'] = rolling.astype(np.float32)
+    return df
+
+
+def compact_dtypes(df):
+    """原地把已有的衍生特征和观测要素列转换为紧凑类型（如从CSV重新加载后）"""
+    for column, dtype in FEATURE_DTYPES.items():
+        if column in df.columns and df[column].dtype not in (dtype, NULLABLE_FEATURE_DTYPES[column]):
+            df[column] = df[column].astype(dtype if df[column].notna().all() else NULLABLE_FEATURE_DTYPES[column])
+    for column in MEASUREMENTS + [column for column in df.columns if str(column).startswith('temp_ma')]:
+        if column in df.columns and df[column].dtype == np.float64:
+            df[column] = df[column].astype(np.float32)
+    if 'season' in df.columns and df['season'].dtype != SEASON_DTYPE:
+        df['season'] = pd.Categorical(df['season'], dtype=SEASON_DTYPE)
+    return df
+
+
+def derive_features(df, inplace=False, hemisphere='north', rolling_windows=ROLLING_WINDOWS,
+                    station_col='station_id', downcast=True):
+    """
+    一次性计算所有衍生特征
+    :param df: 包含 date 列的DataFrame
+    :param inplace: 是否直接修改 df（不复制整个DataFrame）
+    :param hemisphere: 'north' 或 'south'；数据中有 latitude 列时按各行纬度判断南北半球
+    :param rolling_windows: 温度滑动平均的窗口（行数），为空时不计算（如分块处理时）
+    :param station_col: 站点ID列名，滑动平均按站点分别计算
+    :param downcast: 是否把观测要素转换为 float32
+    :return: 添加了 month(int8)、day_of_year(int16)、season(分类)、temp_ma*(float32) 列的DataFrame；
+             日期中有缺失值（NaT）时 month、day_of_year 为可空的 Int8、Int16，对应行的季节为缺失值
+    """
+    if hemisphere not in ('north', 'south'):
+        raise ValueError(f"不支持的半球: {hemisphere}，可选: 'north'、'south'")
+    if not inplace:
+        df = df.copy()
+
+    # 只在日期列还不是日期类型时解析一次
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    dates = df['date'].dt
+    if df['date'].isna().any():
+        df['month'] = dates.month.astype('Int8')
+        df['day_of_year'] = dates.dayofyear.astype('Int16')
+    else:
+        df['month'] = dates.month.astype(np.int8)
+        df['day_of_year'] = dates.dayofyear.astype(np.int16)
+
+    if 'latitude' in df.columns:
+        southern = (df['latitude'] < 0).to_numpy()
+    else:
+        southern = hemisphere == 'south'
+    df['season'] = season_from_month(df['month'].to_numpy(), southern)
+
+    if downcast:
+        for column in MEASUREMENTS:
+            if column in df.columns:
+                df[column] = df[column].astype(np.float32)
+
+    if rolling_windows:
+        add_rolling_features(df, rolling_windows, station_col)
+    return df
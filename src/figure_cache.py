@@ -0,0 +1,95 @@
+"""
+图表缓存模块
+负责人：Person 3 (可视化工程师)
+功能：按输入数据内容、绘图参数和库版本对静态图表做内容寻址缓存，按LRU策略限制缓存大小
+"""
+
+import hashlib
+import os
+import shutil
+from contextlib import suppress
+
+import pandas as pd
+
+
+def _library_versions():
+    """影响渲染结果的库版本"""
+    import matplotlib
+    import numpy
+    import seaborn
+    return f"matplotlib={matplotlib.__version__};seaborn={seaborn.__version__};" \
+           f"pandas={pd.__version__};numpy={numpy.__version__}"
+
+
+class FigureCache:
+    """静态图表（PNG）的内容寻址缓存"""
+
+    def __init__(self, cache_dir=os.path.join('results', '.figure_cache'), max_bytes=200 * 1024 * 1024):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存总大小上限，超出时淘汰最久未使用的图表
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def make_key(self, data, columns, **params):
+        """
+        计算缓存键
+        :param data: 绘图数据
+        :param columns: 图表实际使用的列，其他列的变化不会使缓存失效
+        :param params: 绘图参数（图表类型、点数预算等）
+        :return: 十六进制哈希字符串
+        """
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(data[list(columns)], index=False).values.tobytes())
+        digest.update(repr(sorted(params.items())).encode('utf-8'))
+        digest.update(_library_versions().encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def contains(self, key):
+        """缓存中是否有该图表"""
+        return os.path.exists(self._path(key))
+
+    def fetch(self, key, save_path):
+        """
+        缓存命中时把图表复制到 save_path
+        :return: 是否命中
+        """
+        cached = self._path(key)
+        try:
+            os.utime(cached)  # 更新访问时间，用于LRU淘汰
+            if os.path.abspath(cached) != os.path.abspath(save_path):
+                shutil.copyfile(cached, save_path)
+        except FileNotFoundError:
+            # 不存在，或刚被其他进程淘汰
+            return False
+        return True
+
+    def store(self, key, save_path):
+        """把新渲染的图表存入缓存，并按大小上限淘汰旧图表"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 先写临时文件再原子替换，其他进程不会读到写了一半的图表
+        temp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        shutil.copyfile(save_path, temp_path)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        # 无界面模式下多个进程会同时淘汰，同一个文件可能已被其他进程删除
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.png'):
+                with suppress(FileNotFoundError):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
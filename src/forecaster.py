@@ -0,0 +1,214 @@
+"""
+天气预测模块
+负责人：Person 4 (lumos-0)
+功能：季节谐波回归 + 梯度提升残差模型的多站点、多步天气预测
+"""
+
+import numpy as np
+import pandas as pd
+
+TARGETS = ['temperature', 'humidity', 'precipitation', 'wind_speed']
+# 预测结果的物理取值范围
+VALUE_RANGES = {
+    'temperature': (-50, 50),
+    'humidity': (0, 100),
+    'precipitation': (0, None),
+    'wind_speed': (0, None),
+}
+
+
+class WeatherForecaster:
+    """
+    天气预测器。
+    每个要素先用季节谐波回归（含线性趋势和站点偏移）拟合气候态，
+    再用一个以预测步长为特征的梯度提升模型预测气候态残差，
+    因此一次 predict 调用即可对所有站点、所有步长批量预测。
+    """
+
+    def __init__(self, targets=TARGETS, horizon=7, n_harmonics=3, lags=(1, 2, 3, 7),
+                 station_col='station_id', max_train_rows=500_000, max_iter=200, random_state=42):
+        """
+        :param targets: 需要预测的要素列表。
+        :param horizon: 最大预测步长（天）。
+        :param n_harmonics: 季节谐波的阶数。
+        :param lags: 残差的滞后阶数（天）。
+        :param station_col: 站点ID列名，数据中没有该列时视为单站点。
+        :param max_train_rows: 梯度提升模型的最大训练样本数，超出时随机抽样。
+        :param max_iter: 梯度提升的迭代次数。
+        :param random_state: 随机种子。
+        """
+        self.targets = list(targets)
+        self.horizon = horizon
+        self.n_harmonics = n_harmonics
+        self.lags = tuple(lags)
+        self.station_col = station_col
+        self.max_train_rows = max_train_rows
+        self.max_iter = max_iter
+        self.random_state = random_state
+        self.origin_ = None
+        self.n_harmonics_ = n_harmonics
+        self.use_trend_ = True
+        self.climatology_ = {}
+        self.station_offsets_ = {}
+        self.models_ = {}
+
+    def _to_daily(self, df):
+        """
+        统一到站点×日的分辨率（降水求和，其余取平均），并按站点、日期排序。
+        每个站点补齐从首日到末日的完整日历（缺测日的要素为缺失值），按行的 shift 即为按天的滞后，
+        季节筛选或缺测后的数据也不会把相隔多天的观测当作相邻日。
+        """
+        stations = df[self.station_col] if self.station_col in df.columns else pd.Series('all', index=df.index)
+        dates = df['date'] if pd.api.types.is_datetime64_any_dtype(df['date']) else pd.to_datetime(df['date'])
+        daily = df[self.targets].assign(_station=stations.astype(str).values, date=dates.dt.floor('D'))
+        agg = {target: ('sum' if target == 'precipitation' else 'mean') for target in self.targets}
+        daily = daily.groupby(['_station', 'date'], sort=True).agg(agg)
+
+        bounds = daily.index.to_frame(index=False).groupby('_station', sort=True)['date'].agg(['min', 'max'])
+        lengths = ((bounds['max'] - bounds['min']) // pd.Timedelta(days=1)).to_numpy() + 1
+        day = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        calendar = pd.MultiIndex.from_arrays([
+            np.repeat(bounds.index.to_numpy(), lengths),
+            np.repeat(bounds['min'].to_numpy(), lengths) + day.astype('timedelta64[D]'),
+        ], names=['_station', 'date'])
+        return daily.reindex(calendar).reset_index()
+
+    def _harmonics(self, day_of_year, n_harmonics):
+        angle = 2 * np.pi * np.outer(day_of_year, np.arange(1, n_harmonics + 1)) / 365.25
+        return np.hstack([np.sin(angle), np.cos(angle)])
+
+    def _climatology_design(self, dates):
+        dates = pd.DatetimeIndex(dates)
+        columns = [np.ones(len(dates))]
+        if self.use_trend_:
+            columns.append(((dates - self.origin_) / pd.Timedelta(days=1)).to_numpy() / 365.25)
+        if self.n_harmonics_:
+            columns.append(self._harmonics(dates.dayofyear, self.n_harmonics_))
+        return np.column_stack(columns)
+
+    def _residuals(self, daily):
+        """计算各要素相对于气候态和站点偏移的残差"""
+        design = self._climatology_design(daily['date'])
+        residuals = {}
+        for target in self.targets:
+            offsets = daily['_station'].map(self.station_offsets_[target]).fillna(0).to_numpy()
+            residuals[target] = daily[target].to_numpy(dtype=float) - design @ self.climatology_[target] - offsets
+        return pd.DataFrame(residuals, index=daily.index)
+
+    def _origin_features(self, daily, residuals):
+        """预测起点处的特征：各要素残差的滞后值和7日滑动平均"""
+        grouped = residuals.groupby(daily['_station'], sort=False)
+        columns = {}
+        for lag in self.lags:
+            shifted = grouped.shift(lag - 1)
+            for target in self.targets:
+                columns[f'{target}_lag{lag}'] = shifted[target]
+        rolling = grouped.rolling(7, min_periods=1).mean().reset_index(level=0, drop=True).sort_index()
+        for target in self.targets:
+            columns[f'{target}_ma7'] = rolling[target]
+        return pd.DataFrame(columns, index=daily.index).to_numpy(dtype=float)
+
+    def _step_features(self, origin_features, origin_dates, steps):
+        """拼接起点特征、预测步长和目标日期的季节特征"""
+        target_dates = pd.DatetimeIndex(origin_dates) + pd.to_timedelta(steps, unit='D')
+        return np.column_stack([steps, self._harmonics(target_dates.dayofyear, 1), origin_features]), target_dates
+
+    def fit(self, df):
+        """
+        训练预测模型。
+        :param df: 包含 date、要素列和（可选）站点列的历史数据。
+        :return: self
+        """
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        daily = self._to_daily(df)
+        self.origin_ = daily['date'].min()
+        # 历史不足一年时无法可靠估计季节谐波，不足两年时不估计趋势，避免外推发散
+        span_days = (daily['date'].max() - self.origin_).days
+        self.n_harmonics_ = self.n_harmonics if span_days >= 360 else 0
+        self.use_trend_ = span_days >= 730
+
+        # 1. 季节谐波回归（所有站点共用），站点偏移取各站点残差均值
+        design = self._climatology_design(daily['date'])
+        for target in self.targets:
+            y = daily[target].to_numpy(dtype=float)
+            valid = ~np.isnan(y)
+            self.climatology_[target] = np.linalg.lstsq(design[valid], y[valid], rcond=None)[0]
+            residual = pd.Series(y - design @ self.climatology_[target], index=daily.index)
+            self.station_offsets_[target] = residual.groupby(daily['_station']).mean().to_dict()
+
+        # 2. 残差的梯度提升模型，每个步长从有观测的日期中随机抽取部分起点作为训练样本
+        residuals = self._residuals(daily)
+        origin_features = self._origin_features(daily, residuals)
+        grouped = residuals.groupby(daily['_station'], sort=False)
+        observed = daily[self.targets].notna().any(axis=1).to_numpy()
+        rng = np.random.default_rng(self.random_state)
+        per_step = max(1, self.max_train_rows // self.horizon)
+
+        features, labels = [], []
+        for step in range(1, self.horizon + 1):
+            future = grouped.shift(-step).to_numpy(dtype=float)
+            rows = np.flatnonzero(observed & ~np.isnan(future).all(axis=1))
+            if len(rows) > per_step:
+                rows = rng.choice(rows, per_step, replace=False)
+            step_features, _ = self._step_features(origin_features[rows], daily['date'].to_numpy()[rows],
+                                                   np.full(len(rows), step))
+            features.append(step_features)
+            labels.append(future[rows])
+        features = np.vstack(features)
+        labels = np.vstack(labels)
+
+        for i, target in enumerate(self.targets):
+            valid = ~np.isnan(labels[:, i])
+            model = HistGradientBoostingRegressor(max_iter=self.max_iter, random_state=self.random_state)
+            self.models_[target] = model.fit(features[valid], labels[valid, i]) if valid.sum() > 1 else None
+        return self
+
+    def predict(self, df, horizon=None):
+        """
+        从每个站点的最后一个观测日起预测未来若干天。
+        :param df: 历史数据（至少包含最近 max(lags)+7 天）。
+        :param horizon: 预测天数，默认使用训练时的 horizon（不能超过它）。
+        :return: DataFrame，每行为一个站点的一个预测日，包含 horizon 列和各要素预测值。
+        """
+        if not self.models_:
+            raise ValueError("模型尚未训练，请先调用 fit。")
+        horizon = min(horizon or self.horizon, self.horizon)
+
+        daily = self._to_daily(df)
+        residuals = self._residuals(daily)
+        origin_features = self._origin_features(daily, residuals)
+        last_rows = daily.groupby('_station', sort=True).tail(1).index.to_numpy()
+
+        # 所有站点 × 所有步长组成一个特征矩阵，每个要素只调用一次 predict
+        steps = np.tile(np.arange(1, horizon + 1), len(last_rows))
+        origins = np.repeat(last_rows, horizon)
+        step_features, target_dates = self._step_features(origin_features[origins],
+                                                          daily['date'].to_numpy()[origins], steps)
+        stations = daily['_station'].to_numpy()[origins]
+        design = self._climatology_design(target_dates)
+
+        forecast = pd.DataFrame({self.station_col: stations, 'date': target_dates, 'horizon': steps})
+        for target in self.targets:
+            offsets = pd.Series(stations).map(self.station_offsets_[target]).fillna(0).to_numpy()
+            values = design @ self.climatology_[target] + offsets
+            if self.models_[target] is not None:
+                values = values + self.models_[target].predict(step_features)
+            low, high = VALUE_RANGES.get(target, (None, None))
+            forecast[target] = np.round(np.clip(values, low, high), 1)
+
+        if self.station_col not in df.columns:
+            forecast = forecast.drop(columns=self.station_col)
+        return forecast
+
+    def save(self, path):
+        """持久化训练好的预测器"""
+        import joblib
+        joblib.dump(self, path)
+        return path
+
+    @staticmethod
+    def load(path):
+        """加载持久化的预测器"""
+        import joblib
+        return joblib.load(path)
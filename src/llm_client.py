@@ -0,0 +1,173 @@
+"""
+大模型客户端模块
+负责人：Person 4 (lumos-0)
+功能：基于 asyncio 的 OpenAI 兼容接口客户端，支持并发上限、指数退避重试、相同请求合并，
+     以及按 prompt 哈希持久化的响应缓存（base_url 可指向本地模拟服务器用于测试）
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+def _require_openai():
+    """按需导入openai，未安装时给出明确提示"""
+    try:
+        import openai
+    except ImportError as e:
+        raise ImportError("大模型洞察需要安装 openai：pip install openai") from e
+    return openai
+
+
+class ResponseCache:
+    """以 prompt 哈希为键的 SQLite 响应缓存，相同请求不会重复调用接口"""
+
+    def __init__(self, path=os.path.join('results', '.llm_cache.sqlite')):
+        """
+        :param path: 缓存数据库路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS responses "
+                         "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def make_key(model, prompt, **params):
+        """由模型名、prompt 和生成参数计算缓存键"""
+        payload = json.dumps({'model': model, 'prompt': prompt, 'params': params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, response):
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)",
+                         (key, response, time.time()))
+
+
+class AsyncInsightClient:
+    """
+    异步大模型客户端。
+    generate_many 会合并相同的 prompt，只对缓存未命中的请求并发调用接口，并发数由信号量限制；
+    限流、超时、连接错误和服务端错误按指数退避（带随机抖动）重试。
+    """
+
+    def __init__(self, api_key=None, base_url=None, model=DEFAULT_MODEL, max_concurrency=4, max_retries=3,
+                 backoff=1.0, timeout=60.0, max_tokens=300, temperature=0.3, cache=None):
+        """
+        :param api_key: API密钥，默认读取环境变量 OPENAI_API_KEY。
+        :param base_url: OpenAI 兼容接口地址，默认读取环境变量 OPENAI_BASE_URL；可指向本地模拟服务器。
+        :param model: 模型名。
+        :param max_concurrency: 同时进行的最大请求数。
+        :param max_retries: 单个请求失败后的最大重试次数。
+        :param backoff: 第一次重试前的等待时间（秒），之后每次翻倍。
+        :param timeout: 单个请求的超时时间（秒）。
+        :param max_tokens: 每个回复的最大token数。
+        :param temperature: 采样温度。
+        :param cache: ResponseCache 实例；None 表示不缓存。
+        """
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.cache = cache
+
+    def _cache_key(self, prompt):
+        return ResponseCache.make_key(self.model, prompt, max_tokens=self.max_tokens, temperature=self.temperature)
+
+    async def _request(self, client, semaphore, prompt):
+        """带并发上限和重试的单次请求"""
+        openai = _require_openai()
+        retryable = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                     openai.InternalServerError)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    response = await client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=self.max_tokens,
+                        temperature=self.temperature,
+                    )
+                return (response.choices[0].message.content or "").strip()
+            except retryable:
+                if attempt == self.max_retries:
+                    raise
+                # 指数退避，随机抖动避免多个请求同时重试
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    async def agenerate_many(self, prompts):
+        """
+        并发生成多个回复。
+        :param prompts: prompt 列表
+        :return: 与 prompts 一一对应的列表，元素为回复文本；失败的请求为对应的异常对象
+        """
+        results = {}
+        pending = []
+        # 合并相同的 prompt，并先查询缓存
+        for prompt in dict.fromkeys(prompts):
+            cached = self.cache.get(self._cache_key(prompt)) if self.cache else None
+            if cached is not None:
+                results[prompt] = cached
+            else:
+                pending.append(prompt)
+
+        if pending:
+            openai = _require_openai()
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            # 重试由本客户端控制，关闭SDK内置重试
+            async with openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          timeout=self.timeout, max_retries=0) as client:
+                responses = await asyncio.gather(*(self._request(client, semaphore, prompt) for prompt in pending),
+                                                 return_exceptions=True)
+            for prompt, response in zip(pending, responses):
+                results[prompt] = response
+                if self.cache and not isinstance(response, BaseException):
+                    self.cache.put(self._cache_key(prompt), response)
+        return [results[prompt] for prompt in prompts]
+
+    async def agenerate(self, prompt):
+        """生成单个回复，失败时抛出异常"""
+        result = (await self.agenerate_many([prompt]))[0]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def generate_many(self, prompts):
+        """agenerate_many 的同步版本；在已有事件循环的线程中调用时改在新线程中运行"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.agenerate_many(prompts))
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.agenerate_many(prompts)).result()
+
+    def generate(self, prompt):
+        """agenerate 的同步版本"""
+        result = self.generate_many([prompt])[0]
+        if isinstance(result, BaseException):
+            raise result
+        return result
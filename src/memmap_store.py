@@ -0,0 +1,410 @@
+"""
+内存映射数据集模块
+负责人：Person 2 (2001wzh)
+功能：按列存储的 NumPy 内存映射数据集格式（每列一个二进制文件 + 元数据JSON + 站点/日期偏移索引），
+     按站点或日期范围切片时只读取需要的页，可以流式写入并分块分析比内存更大的站点档案
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+SUFFIX = '.wxmm'
+METADATA_FILE = 'metadata.json'
+STATION_OFFSETS_FILE = 'station_offsets.npy'
+DAY_OFFSETS_FILE = 'day_offsets.npy'
+DEFAULT_CHUNK_ROWS = 1_000_000
+# 分类列的编码类型（写入时不知道最终类别数）
+CODE_DTYPE = np.int32
+
+
+def _day_numbers(values):
+    """datetime64 数组转换为自 1970-01-01 起的天数"""
+    return values.astype('datetime64[D]').astype(np.int64)
+
+
+def _column_file(directory, name, suffix='.bin'):
+    return os.path.join(directory, f"{name}{suffix}")
+
+
+class _ColumnWriter:
+    """把一列的各个数据块追加写入二进制文件，分类列在各块之间使用统一的类别编码"""
+
+    def __init__(self, directory, index, name, values):
+        self.name = name
+        # 列名可能包含文件名中不允许的字符，文件名只使用列序号
+        self.file = f"col{index:03d}"
+        self.path = _column_file(directory, self.file)
+        self.mask_path = None
+        dtype = values.dtype
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype) \
+                or pd.api.types.is_string_dtype(dtype):
+            self.kind = 'category'
+            ordered = bool(getattr(dtype, 'ordered', False))
+            categories = list(dtype.categories) if isinstance(dtype, pd.CategoricalDtype) else []
+            self.meta = {'kind': 'category', 'dtype': np.dtype(CODE_DTYPE).str, 'ordered': ordered}
+            self.categories = categories
+            self.lookup = {category: code for code, category in enumerate(categories)}
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            if getattr(dtype, 'tz', None) is not None:
+                raise ValueError(f"列 {name} 带时区，内存映射格式只支持不带时区的日期")
+            self.kind = 'datetime'
+            self.meta = {'kind': 'datetime', 'dtype': np.dtype(dtype).str}
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and hasattr(dtype, 'numpy_dtype'):
+            # 可空整数/布尔类型：数值与缺失掩码分开保存
+            self.kind = 'masked'
+            self.mask_path = _column_file(directory, self.file, '.mask')
+            self.meta = {'kind': 'masked', 'dtype': np.dtype(dtype.numpy_dtype).str, 'pandas_dtype': str(dtype)}
+        else:
+            self.kind = 'numeric'
+            self.meta = {'kind': 'numeric', 'dtype': np.dtype(dtype).str}
+        self.dtype = np.dtype(self.meta['dtype'])
+        self._handle = open(self.path, 'wb')
+        self._mask_handle = open(self.mask_path, 'wb') if self.mask_path else None
+
+    def _encode_categories(self, values):
+        categorical = values.array if isinstance(values.dtype, pd.CategoricalDtype) else pd.Categorical(values)
+        mapping = np.empty(len(categorical.categories), dtype=CODE_DTYPE)
+        for i, category in enumerate(categorical.categories):
+            code = self.lookup.get(category)
+            if code is None:
+                code = self.lookup[category] = len(self.categories)
+                self.categories.append(category)
+            mapping[i] = code
+        codes = np.asarray(categorical.codes)
+        return np.where(codes >= 0, mapping[np.maximum(codes, 0)] if len(mapping) else -1, -1).astype(CODE_DTYPE)
+
+    def encode(self, values):
+        """把一个数据块编码为写入文件的 NumPy 数组"""
+        if self.kind == 'category':
+            return self._encode_categories(values)
+        if self.kind == 'masked':
+            return values.to_numpy(dtype=self.dtype, na_value=0)
+        values = values.to_numpy()
+        if self.dtype.kind in 'iub' and values.dtype.kind == 'f' and np.isnan(values).any():
+            raise ValueError(f"列 {self.name} 在后续数据块中出现缺失值，请先统一为浮点类型")
+        return np.asarray(values, dtype=self.dtype)
+
+    def append(self, values):
+        """追加一个数据块，返回编码后的数组"""
+        encoded = self.encode(values)
+        encoded.tofile(self._handle)
+        if self._mask_handle is not None:
+            values.isna().to_numpy().tofile(self._mask_handle)
+        return encoded
+
+    def close(self):
+        self._handle.close()
+        if self._mask_handle is not None:
+            self._mask_handle.close()
+        meta = dict(self.meta, name=self.name, file=self.file, mask=self.mask_path is not None)
+        if self.kind == 'category':
+            meta['categories'] = [category.item() if isinstance(category, np.generic) else category
+                                  for category in self.categories]
+        return meta
+
+
+def _iter_frames(data, chunk_rows):
+    if isinstance(data, pd.DataFrame):
+        if len(data) == 0:
+            yield data
+        for start in range(0, len(data), chunk_rows):
+            yield data.iloc[start:start + chunk_rows]
+    else:
+        yield from data
+
+
+def _open_column(directory, meta, rows, mode='r'):
+    """以内存映射方式打开一列（零行时返回空数组）"""
+    dtype = np.dtype(meta['dtype'])
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(_column_file(directory, meta['file']), dtype=dtype, mode=mode, shape=(rows,))
+
+
+def _reorder(directory, columns, rows, station_meta, date_meta, chunk_rows):
+    """输入不是按（站点, 日期）有序时，按排序位置分块重排各列文件（需要约 20 字节/行的内存）"""
+    keys = []
+    if date_meta is not None:
+        keys.append(np.asarray(_open_column(directory, date_meta, rows)))
+    if station_meta is not None:
+        keys.append(np.asarray(_open_column(directory, station_meta, rows)))
+    order = np.lexsort(keys)
+    del keys
+    for meta in columns:
+        files = [(meta['file'], '.bin', np.dtype(meta['dtype']))]
+        if meta['mask']:
+            files.append((meta['file'], '.mask', np.dtype(bool)))
+        for name, suffix, dtype in files:
+            source_path = _column_file(directory, name, suffix)
+            source = np.memmap(source_path, dtype=dtype, mode='r', shape=(rows,))
+            with open(source_path + '.sorted', 'wb') as f:
+                for start in range(0, rows, chunk_rows):
+                    source[order[start:start + chunk_rows]].tofile(f)
+            del source
+            os.replace(source_path + '.sorted', source_path)
+
+
+def _build_index(directory, rows, station_meta, date_meta):
+    """
+    构建站点偏移索引（每个站点在文件中的行区间）和日期偏移索引
+    （day_offsets[s, d] 为站点 s 中第一个日期不早于 min_day + d 的行）
+    """
+    n_stations = len(station_meta['categories']) if station_meta is not None else 1
+    if station_meta is not None and rows:
+        codes = _open_column(directory, station_meta, rows)
+        # 数据已按站点编码排序，二分查找只触及少量页
+        station_offsets = np.searchsorted(codes, np.arange(n_stations + 1)).astype(np.int64)
+        del codes
+    else:
+        station_offsets = np.array([0, rows], dtype=np.int64)
+    np.save(os.path.join(directory, STATION_OFFSETS_FILE), station_offsets)
+
+    if date_meta is None or rows == 0:
+        return None, None
+    dates = _open_column(directory, date_meta, rows)
+    min_day, max_day = None, None
+    for s in range(n_stations):
+        start, stop = station_offsets[s], station_offsets[s + 1]
+        if stop > start:
+            first, last = _day_numbers(dates[[start, stop - 1]])
+            min_day = first if min_day is None else min(min_day, first)
+            max_day = last if max_day is None else max(max_day, last)
+    n_days = int(max_day - min_day) + 1
+    day_offsets = np.lib.format.open_memmap(os.path.join(directory, DAY_OFFSETS_FILE), mode='w+',
+                                            dtype=np.int64, shape=(n_stations, n_days + 1))
+    targets = int(min_day) + np.arange(n_days + 1)
+    for s in range(n_stations):
+        start, stop = station_offsets[s], station_offsets[s + 1]
+        day_offsets[s] = start + np.searchsorted(_day_numbers(np.asarray(dates[start:stop])), targets)
+    day_offsets.flush()
+    del day_offsets, dates
+    return int(min_day), int(max_day)
+
+
+def write_memmap(data, path, station_col='station_id', date_col='date', chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    写出内存映射数据集
+    :param data: DataFrame，或逐块产出 DataFrame 的可迭代对象（各块列相同，用于流式转换大文件）
+    :param path: 数据集目录（约定以 .wxmm 结尾），已存在时被替换
+    :param station_col: 站点ID列名，数据中没有该列时视为单站点
+    :param date_col: 日期列名，数据中没有该列时不建立日期索引
+    :param chunk_rows: data 为 DataFrame 时每次写入的行数；重排时每块的行数
+    :return: 元数据字典
+    """
+    temp_path = f"{path}.tmp"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+
+    writers, rows, ordered = None, 0, True
+    last_key = None
+    try:
+        for frame in _iter_frames(data, chunk_rows):
+            if writers is None:
+                writers = [_ColumnWriter(temp_path, i, name, frame[name]) for i, name in enumerate(frame.columns)]
+                by_name = {writer.name: writer for writer in writers}
+                station_writer = by_name.get(station_col)
+                date_writer = by_name.get(date_col)
+            elif list(frame.columns) != [writer.name for writer in writers]:
+                raise ValueError("各数据块的列必须相同")
+            if len(frame) == 0:
+                continue
+
+            encoded = {writer.name: writer.append(frame[writer.name]) for writer in writers}
+            rows += len(frame)
+
+            # 检查是否已按（站点编码, 日期）有序，有序时无需重排
+            if date_writer is not None and np.isnat(encoded[date_col]).any():
+                raise ValueError(f"日期列 {date_col} 存在缺失值，无法建立日期索引")
+            if station_writer is not None and (encoded[station_col] < 0).any():
+                raise ValueError(f"站点列 {station_col} 存在缺失值，无法建立站点索引")
+            if ordered:
+                stations = encoded[station_col].astype(np.int64) if station_writer else np.zeros(len(frame), np.int64)
+                dates = encoded[date_col].astype(np.int64) if date_writer else np.zeros(len(frame), np.int64)
+                if last_key is not None and (stations[0], dates[0]) < last_key:
+                    ordered = False
+                same_station = stations[1:] == stations[:-1]
+                if (stations[1:] < stations[:-1]).any() or (same_station & (dates[1:] < dates[:-1])).any():
+                    ordered = False
+                last_key = (stations[-1], dates[-1])
+    except BaseException:
+        for writer in writers or []:
+            writer.close()
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+    columns = [writer.close() for writer in writers] if writers is not None else []
+    if writers is None:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise ValueError("没有可写入的数据")
+
+    station_meta = next((meta for meta in columns if meta['name'] == station_col), None)
+    date_meta = next((meta for meta in columns if meta['name'] == date_col), None)
+    if station_meta is not None and station_meta['kind'] != 'category':
+        raise ValueError(f"站点列 {station_col} 必须为字符串或分类类型")
+    if date_meta is not None and date_meta['kind'] != 'datetime':
+        raise ValueError(f"日期列 {date_col} 必须为日期类型")
+    if not ordered:
+        _reorder(temp_path, columns, rows, station_meta, date_meta, chunk_rows)
+    min_day, max_day = _build_index(temp_path, rows, station_meta, date_meta)
+
+    metadata = {
+        'version': FORMAT_VERSION,
+        'rows': rows,
+        'columns': columns,
+        'station_col': station_col if station_meta is not None else None,
+        'date_col': date_col if date_meta is not None else None,
+        'min_day': min_day,
+        'max_day': max_day,
+    }
+    with open(os.path.join(temp_path, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2, default=str)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(temp_path, path)
+    return metadata
+
+
+class MemmapDataset:
+    """
+    只读的内存映射数据集。
+    行按（站点, 日期）排列，按站点或日期范围取数时先由偏移索引（天粒度）得到行区间，
+    再按精确时间戳收紧边界日，只从各列文件中读取这些区间；column() 返回未复制的内存映射数组，可直接用于分块计算。
+    """
+
+    def __init__(self, path):
+        """
+        :param path: write_memmap 写出的数据集目录
+        """
+        with open(os.path.join(path, METADATA_FILE), encoding='utf-8') as f:
+            self.metadata = json.load(f)
+        if self.metadata['version'] > FORMAT_VERSION:
+            raise ValueError(f"不支持的内存映射数据集版本: {self.metadata['version']}")
+        self.path = path
+        self._columns = {meta['name']: meta for meta in self.metadata['columns']}
+        self._arrays = {}
+        self.station_offsets = np.load(os.path.join(path, STATION_OFFSETS_FILE))
+        day_offsets_path = os.path.join(path, DAY_OFFSETS_FILE)
+        self.day_offsets = np.load(day_offsets_path, mmap_mode='r') if os.path.exists(day_offsets_path) else None
+
+    def __len__(self):
+        return self.metadata['rows']
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def stations(self):
+        """站点ID列表（顺序即文件中的站点顺序）"""
+        station_col = self.metadata['station_col']
+        return list(self._columns[station_col]['categories']) if station_col else []
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self.metadata['min_day'], unit='D') if self.metadata['min_day'] is not None else None
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self.metadata['max_day'], unit='D') if self.metadata['max_day'] is not None else None
+
+    def column(self, name):
+        """
+        某一列的内存映射数组（分类列为类别编码，可空类型不含缺失掩码），不复制数据
+        """
+        if name not in self._arrays:
+            self._arrays[name] = _open_column(self.path, self._columns[name], len(self))
+        return self._arrays[name]
+
+    def _station_codes(self, stations):
+        if stations is None:
+            return np.arange(len(self.station_offsets) - 1)
+        if isinstance(stations, str):
+            stations = [stations]
+        lookup = {station: code for code, station in enumerate(self.stations)}
+        return np.array(sorted({lookup[station] for station in stations if station in lookup}), dtype=np.int64)
+
+    def ranges(self, start_date=None, end_date=None, stations=None):
+        """
+        满足条件的行区间
+        :param start_date: 起始时间（含），与其他存储后端一样按完整时间戳比较
+        :param end_date: 结束时间（含），如 '2023-01-06' 只包含当天 00:00
+        :param stations: 站点ID或站点ID列表，None 表示全部站点
+        :return: (starts, ends) 两个 int64 数组，区间互不重叠且按行号升序
+        """
+        codes = self._station_codes(stations)
+        if (start_date is None and end_date is None) or self.day_offsets is None:
+            starts, ends = self.station_offsets[codes], self.station_offsets[codes + 1]
+        else:
+            n_days = self.day_offsets.shape[1] - 1
+            min_day = self.metadata['min_day']
+            lo = 0 if start_date is None else int(np.clip(_day_numbers(np.datetime64(pd.Timestamp(start_date).date()))
+                                                          - min_day, 0, n_days))
+            hi = n_days if end_date is None else int(np.clip(_day_numbers(np.datetime64(pd.Timestamp(end_date).date()))
+                                                             - min_day + 1, 0, n_days))
+            hi = max(lo, hi)
+            starts = np.array(self.day_offsets[codes, lo], dtype=np.int64)
+            ends = np.array(self.day_offsets[codes, hi], dtype=np.int64)
+            self._clip_timestamps(starts, ends, start_date, end_date)
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        if len(starts) == 0:
+            return starts, ends
+        # 合并首尾相接的区间（如相邻站点的全部数据）
+        breaks = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+        return starts[np.concatenate([[0], breaks])], ends[np.append(breaks - 1, len(ends) - 1)]
+
+    def _clip_timestamps(self, starts, ends, start_date, end_date):
+        """按精确时间戳原地收紧各站点的行区间（站点内按日期有序，二分查找只访问边界日附近的页）"""
+        dates = self.column(self.metadata['date_col'])
+        lower = None if start_date is None else pd.Timestamp(start_date).to_datetime64().astype(dates.dtype)
+        upper = None if end_date is None else pd.Timestamp(end_date).to_datetime64().astype(dates.dtype)
+        for i, (start, stop) in enumerate(zip(starts, ends)):
+            if stop <= start:
+                continue
+            segment = dates[start:stop]
+            if lower is not None:
+                starts[i] = start + np.searchsorted(segment, lower, side='left')
+            if upper is not None:
+                ends[i] = max(starts[i], start + np.searchsorted(segment, upper, side='right'))
+
+    def _read(self, name, starts, ends):
+        """读取一列在若干行区间中的值并还原为 pandas 类型"""
+        meta = self._columns[name]
+        array = self.column(name)
+        values = np.concatenate([array[start:stop] for start, stop in zip(starts, ends)]) \
+            if len(starts) else np.empty(0, dtype=array.dtype)
+        if meta['kind'] == 'category':
+            dtype = pd.CategoricalDtype(meta['categories'], ordered=meta['ordered'])
+            return pd.Categorical.from_codes(values, dtype=dtype)
+        if meta['kind'] == 'masked':
+            mask_file = np.memmap(_column_file(self.path, meta['file'], '.mask'), dtype=bool, mode='r',
+                                  shape=(len(self),)) if len(self) else np.empty(0, dtype=bool)
+            mask = np.concatenate([mask_file[start:stop] for start, stop in zip(starts, ends)]) \
+                if len(starts) else np.empty(0, dtype=bool)
+            return pd.array(np.where(mask, None, values.astype(object)), dtype=meta['pandas_dtype'])
+        return values
+
+    def slice(self, start_date=None, end_date=None, stations=None, columns=None):
+        """
+        取出满足条件的行（只读取对应行区间所在的页）
+        :param columns: 需要的列，None 表示全部
+        :return: DataFrame
+        """
+        starts, ends = self.ranges(start_date, end_date, stations)
+        columns = self.columns if columns is None else list(columns)
+        return pd.DataFrame({name: self._read(name, starts, ends) for name in columns})
+
+    def iter_chunks(self, chunk_rows=DEFAULT_CHUNK_ROWS, start_date=None, end_date=None, stations=None, columns=None):
+        """
+        分块产出满足条件的行，峰值内存只与 chunk_rows 有关，用于分析比内存更大的数据集
+        :return: 逐块产出DataFrame的生成器
+        """
+        starts, ends = self.ranges(start_date, end_date, stations)
+        columns = self.columns if columns is None else list(columns)
+        for start, stop in zip(starts, ends):
+            for block_start in range(int(start), int(stop), chunk_rows):
+                block = (np.array([block_start]), np.array([min(block_start + chunk_rows, int(stop))]))
+                yield pd.DataFrame({name: self._read(name, *block) for name in columns})
@@ -0,0 +1,251 @@
+"""
+增量统计模块
+负责人：Person 2 (2001wzh)
+功能：可合并的在线统计引擎（Welford均值/方差、流式分位数草图、增量协方差与相关系数）
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    可合并的流式分位数草图（KLL风格的分层压缩）。
+    第 i 层的每个元素代表 2**i 个原始值；元素数不超过 k 时结果是精确的。
+    """
+
+    def __init__(self, k=2048):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._parity = 0
+
+    @property
+    def count(self):
+        return int(sum(len(level) << i for i, level in enumerate(self.levels)))
+
+    def update(self, values):
+        """加入一批数值（忽略缺失值）"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """合并另一个草图"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for i, level in enumerate(other.levels):
+            self.levels[i] = np.concatenate([self.levels[i], level])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            buf = self.levels[level]
+            if len(buf) > self.k:
+                buf = np.sort(buf)
+                # 奇数个元素时留下一个，其余两两取一晋升到上一层
+                keep = buf[len(buf) - len(buf) % 2:]
+                promoted = buf[self._parity:len(buf) - len(buf) % 2:2]
+                self._parity ^= 1
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, qs):
+        """
+        查询分位数
+        :param qs: 分位点（0~1）的列表
+        :return: 与 qs 对应的分位数数组
+        """
+        qs = np.atleast_1d(np.asarray(qs, dtype=float))
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        if len(self.levels) == 1:
+            # 未发生压缩，与 pandas 的线性插值结果一致
+            return np.quantile(self.levels[0], qs)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** i) for i, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, cum_weights = values[order], np.cumsum(weights[order])
+        idx = np.searchsorted(cum_weights, qs * (cum_weights[-1] - 1), side='right')
+        return values[np.minimum(idx, len(values) - 1)]
+
+
+class RunningStatistics:
+    """
+    可合并的增量统计量。
+    追加 N 行的代价为 O(N)；不同分片/站点的结果可通过 merge 精确合并
+    （计数、均值、方差、极值、缺失值、协方差与相关系数精确，分位数为草图近似）。
+    """
+
+    QUANTILES = (0.25, 0.5, 0.75)
+
+    def __init__(self, sketch_size=2048):
+        self.sketch_size = sketch_size
+        self.columns = []
+        self.n_rows = 0
+        self.data_types = pd.Series(dtype=object)
+        self.missing = pd.Series(dtype='int64')
+        self.count = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        # 成对统计量：pair_count[i, j] 为 i、j 同时非缺失的行数，
+        # pair_mean[i, j] 为这些行上 i 的均值，pair_m2[i, j] 为其离差平方和，
+        # comoment[i, j] 为这些行上的协离差积和
+        self.pair_count = np.zeros((0, 0))
+        self.pair_mean = np.zeros((0, 0))
+        self.pair_m2 = np.zeros((0, 0))
+        self.comoment = np.zeros((0, 0))
+        self.sketches = {}
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        """由一个DataFrame一次性构建统计量"""
+        return cls(**kwargs).update(df)
+
+    def _ensure_columns(self, columns):
+        new = [col for col in columns if col not in self.columns]
+        if not new:
+            return
+        k_old, k = len(self.columns), len(self.columns) + len(new)
+        self.columns = self.columns + new
+
+        def grow(arr, fill):
+            out = np.full(k, fill)
+            out[:k_old] = arr
+            return out
+
+        def grow2(arr):
+            out = np.zeros((k, k))
+            out[:k_old, :k_old] = arr
+            return out
+
+        self.count, self.mean, self.m2 = grow(self.count, 0.0), grow(self.mean, 0.0), grow(self.m2, 0.0)
+        self.min, self.max = grow(self.min, np.inf), grow(self.max, -np.inf)
+        self.pair_count, self.pair_mean = grow2(self.pair_count), grow2(self.pair_mean)
+        self.pair_m2, self.comoment = grow2(self.pair_m2), grow2(self.comoment)
+        for col in new:
+            self.sketches[col] = QuantileSketch(self.sketch_size)
+
+    def update(self, df):
+        """追加一批观测数据"""
+        numeric = df.select_dtypes(include=[np.number])
+        self._ensure_columns(list(numeric.columns))
+        self.n_rows += len(df)
+        self.data_types = df.dtypes
+        missing = df.isnull().sum()
+        self.missing = missing if self.missing.empty else self.missing.add(missing, fill_value=0).astype('int64')
+        if numeric.empty or len(df) == 0:
+            return self
+
+        idx = np.array([self.columns.index(col) for col in numeric.columns])
+        values = numeric.to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        weights = present.astype(float)
+
+        # 单变量：批内统计后按 Chan 并行公式合并
+        count = weights.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, filled.sum(axis=0) / count, 0.0)
+        m2 = (np.square(filled - mean) * weights).sum(axis=0)
+        self._merge_moments(idx, count, mean, m2)
+        self.min[idx] = np.fmin(self.min[idx], np.where(present, values, np.inf).min(axis=0))
+        self.max[idx] = np.fmax(self.max[idx], np.where(present, values, -np.inf).max(axis=0))
+
+        # 成对统计：只使用两列同时非缺失的行，与 DataFrame.corr 的处理方式一致
+        # （先减去批内均值再累加乘积，避免大数相减带来的精度损失）
+        shifted = np.where(present, values - mean, 0.0)
+        pair_count = weights.T @ weights
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shifted_mean = np.where(pair_count > 0, (shifted.T @ weights) / pair_count, 0.0)
+        pair_m2 = np.square(shifted).T @ weights - pair_count * np.square(shifted_mean)
+        comoment = shifted.T @ shifted - pair_count * shifted_mean * shifted_mean.T
+        pair_mean = shifted_mean + mean[:, None]
+        self._merge_pairs(idx, pair_count, pair_mean, np.maximum(pair_m2, 0.0), comoment)
+
+        for col in numeric.columns:
+            self.sketches[col].update(numeric[col].to_numpy(dtype=float))
+        return self
+
+    def _merge_moments(self, idx, count, mean, m2):
+        n_a, n_b = self.count[idx], count
+        n = n_a + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean[idx]
+            self.mean[idx] = np.where(n > 0, self.mean[idx] + delta * n_b / n, 0.0)
+            self.m2[idx] = np.where(n > 0, self.m2[idx] + m2 + delta ** 2 * n_a * n_b / n, 0.0)
+        self.count[idx] = n
+
+    def _merge_pairs(self, idx, pair_count, pair_mean, pair_m2, comoment):
+        grid = np.ix_(idx, idx)
+        n_a, n_b = self.pair_count[grid], pair_count
+        n = n_a + n_b
+        mean_a = self.pair_mean[grid]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            factor = np.where(n > 0, n_a * n_b / n, 0.0)
+            delta = pair_mean - mean_a
+            self.comoment[grid] = self.comoment[grid] + comoment + delta * delta.T * factor
+            self.pair_m2[grid] = self.pair_m2[grid] + pair_m2 + delta ** 2 * factor
+            self.pair_mean[grid] = np.where(n > 0, mean_a + delta * n_b / n, 0.0)
+        self.pair_count[grid] = n
+
+    def merge(self, other):
+        """精确合并另一个分片（如另一站点）的统计量"""
+        self._ensure_columns(other.columns)
+        idx = np.array([self.columns.index(col) for col in other.columns], dtype=int)
+        self.n_rows += other.n_rows
+        self.missing = other.missing if self.missing.empty else self.missing.add(other.missing, fill_value=0).astype('int64')
+        if self.data_types.empty:
+            self.data_types = other.data_types
+        if len(idx):
+            self._merge_moments(idx, other.count, other.mean, other.m2)
+            self.min[idx] = np.fmin(self.min[idx], other.min)
+            self.max[idx] = np.fmax(self.max[idx], other.max)
+            self._merge_pairs(idx, other.pair_count, other.pair_mean, other.pair_m2, other.comoment)
+            for col in other.columns:
+                self.sketches[col].merge(other.sketches[col])
+        return self
+
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    def describe(self):
+        """与 DataFrame.describe() 结构相同的数值列统计表"""
+        has_values = self.count > 0
+        quantiles = np.array([self.sketches[col].quantile(self.QUANTILES) for col in self.columns]).reshape(-1, len(self.QUANTILES))
+        rows = {
+            'count': self.count,
+            'mean': np.where(has_values, self.mean, np.nan),
+            'std': self.std(),
+            'min': np.where(has_values, self.min, np.nan),
+        }
+        for q, values in zip(self.QUANTILES, quantiles.T):
+            rows[f'{int(q * 100)}%'] = values
+        rows['max'] = np.where(has_values, self.max, np.nan)
+        return pd.DataFrame(rows, index=self.columns).T
+
+    def correlation(self):
+        """皮尔逊相关系数矩阵"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denom = np.sqrt(self.pair_m2 * self.pair_m2.T)
+            corr = np.where((self.pair_count > 1) & (denom > 0), self.comoment / denom, np.nan)
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=self.columns, columns=self.columns)
+
+    def summary(self):
+        """返回与 WeatherDataProcessor.get_statistics 相同结构的统计信息"""
+        return {
+            'basic_stats': self.describe(),
+            'missing_values': self.missing,
+            'data_types': self.data_types,
+            'correlation': self.correlation()
+        }
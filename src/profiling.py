@@ -0,0 +1,205 @@
+"""
+性能监控模块
+负责人：Person 1 (组长)
+功能：记录数据处理、AI分析、可视化和页面函数各阶段的耗时（可选记录峰值内存），
+     汇总为分阶段的延迟统计，并可导出为本地 JSONL 指标文件
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+class PerformanceMonitor:
+    """
+    轻量的分阶段性能监控器（线程安全，可在多个会话间共享）。
+    每个阶段保留最近 max_samples 个样本；未启用时 stage/wrap 几乎没有额外开销。
+    enabled 为 True 时记录所有线程；否则只记录通过 activate 开启的线程（如单个 Streamlit 会话的运行线程）。
+    """
+
+    def __init__(self, enabled=True, track_memory=False, max_samples=1000):
+        """
+        :param enabled: 是否记录所有线程的样本
+        :param track_memory: 是否用 tracemalloc 记录各阶段的峰值内存（会使被测代码明显变慢，默认关闭）。
+                             tracemalloc 的峰值是进程级的，多个线程同时运行被测代码时峰值会相互干扰，只能作参考
+        :param max_samples: 每个阶段保留的最大样本数
+        """
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def active(self):
+        """当前线程是否记录样本"""
+        return self.enabled or getattr(self._local, 'active', False)
+
+    @contextmanager
+    def activate(self):
+        """只在当前线程中开启记录，不影响共享同一监控器的其他线程"""
+        previous = getattr(self._local, 'active', False)
+        self._local.active = True
+        try:
+            yield self
+        finally:
+            self._local.active = previous
+
+    @contextmanager
+    def stage(self, name):
+        """
+        记录一个阶段的耗时，可以嵌套使用
+        :param name: 阶段名称，如 'processor.clean_data'
+        """
+        if not self.active:
+            yield
+            return
+
+        frame = self._enter_memory_frame() if self.track_memory else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            peak_mb = self._exit_memory_frame(frame) if frame is not None else None
+            self.record(name, elapsed_ms, peak_mb)
+
+    def _enter_memory_frame(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        # tracemalloc 的峰值是全局的：进入子阶段前把外层已观测到的峰值保存下来再重置
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame = {'start': current, 'peak': current}
+        stack.append(frame)
+        return frame
+
+    def _exit_memory_frame(self, frame):
+        stack = self._local.stack
+        stack.pop()
+        frame_peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], frame_peak)
+        return (frame_peak - frame['start']) / 1024 ** 2
+
+    def record(self, name, elapsed_ms, peak_mb=None):
+        """记录一个样本（也可用于记录外部计时的结果）"""
+        sample = {'stage': name, 'timestamp': time.time(), 'ms': round(elapsed_ms, 3),
+                  'peak_mb': round(peak_mb, 3) if peak_mb is not None else None,
+                  'thread': threading.current_thread().name}
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(sample)
+
+    def wrap(self, name, func):
+        """返回记录 func 每次调用耗时的包装函数"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.active:
+                return func(*args, **kwargs)
+            with self.stage(name):
+                return func(*args, **kwargs)
+        wrapper.__monitored_by__ = self
+        return wrapper
+
+    def instrument(self, obj, methods, prefix=None):
+        """
+        把对象上的若干方法替换为带计时的版本（重复调用不会重复包装）
+        :param obj: 被监控的对象实例
+        :param methods: 方法名列表，不存在的方法会被忽略
+        :param prefix: 阶段名前缀，默认为类名
+        :return: obj
+        """
+        prefix = prefix or type(obj).__name__
+        for method in methods:
+            func = getattr(obj, method, None)
+            if func is None or getattr(func, '__monitored_by__', None) is self:
+                continue
+            setattr(obj, method, self.wrap(f'{prefix}.{method}', func))
+        return obj
+
+    def stages(self):
+        """已记录的阶段名称列表"""
+        with self._lock:
+            return sorted(self._samples)
+
+    def samples(self, name=None):
+        """
+        获取样本
+        :param name: 阶段名称，None 表示所有阶段
+        :return: 样本DataFrame（stage、timestamp、ms、peak_mb、thread）
+        """
+        with self._lock:
+            if name is None:
+                records = [sample for samples in self._samples.values() for sample in samples]
+            else:
+                records = list(self._samples.get(name, ()))
+        return pd.DataFrame(records, columns=['stage', 'timestamp', 'ms', 'peak_mb', 'thread'])
+
+    def summary(self):
+        """
+        各阶段的延迟统计
+        :return: 按总耗时降序排列的DataFrame（调用次数、均值、p50、p95、最大值、总耗时、最大峰值内存）
+        """
+        rows = []
+        with self._lock:
+            items = [(name, list(samples)) for name, samples in self._samples.items()]
+        for name, samples in items:
+            ms = np.array([sample['ms'] for sample in samples])
+            peaks = [sample['peak_mb'] for sample in samples if sample['peak_mb'] is not None]
+            rows.append({
+                'stage': name,
+                'count': len(ms),
+                'mean_ms': ms.mean(),
+                'p50_ms': np.percentile(ms, 50),
+                'p95_ms': np.percentile(ms, 95),
+                'max_ms': ms.max(),
+                'total_ms': ms.sum(),
+                'peak_mb': max(peaks) if peaks else np.nan,
+            })
+        columns = ['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms', 'peak_mb']
+        summary = pd.DataFrame(rows, columns=columns)
+        return summary.sort_values('total_ms', ascending=False, ignore_index=True).round(3)
+
+    def to_jsonl(self):
+        """把所有样本序列化为 JSON Lines 文本"""
+        records = self.samples().replace({np.nan: None}).to_dict('records')
+        return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    def export(self, path, clear=False):
+        """
+        把所有样本追加写入 JSONL 指标文件
+        :param path: 文件路径
+        :param clear: 写入后是否清空内存中的样本
+        :return: 写入的样本数
+        """
+        content = self.to_jsonl()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(content)
+        if clear:
+            self.clear()
+        return content.count("\n")
+
+    def clear(self):
+        """清空所有样本"""
+        with self._lock:
+            self._samples.clear()
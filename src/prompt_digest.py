@@ -0,0 +1,144 @@
+"""
+Prompt摘要模块
+负责人：Person 4 (lumos-0)
+功能：把数据集及其异常检测结果压缩成固定大小的结构化摘要（分季节统计、Top-K极值、趋势系数、异常聚类），
+     使发送给大模型的 prompt 长度与数据量无关
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from features import MEASUREMENTS, season_from_month
+except ImportError:  # 以 src.prompt_digest 方式导入时
+    from .features import MEASUREMENTS, season_from_month
+
+VARIABLE_NAMES = {'temperature': '温度', 'humidity': '湿度', 'precipitation': '降水量', 'wind_speed': '风速'}
+VARIABLE_UNITS = {'temperature': '°C', 'humidity': '%', 'precipitation': 'mm', 'wind_speed': 'km/h'}
+
+
+def _season_stats(df, variables):
+    """各季节各要素的均值、最小值、最大值"""
+    season = df['season'] if 'season' in df.columns else \
+        pd.Series(season_from_month(pd.to_datetime(df['date']).dt.month.to_numpy()), index=df.index)
+    stats = df[variables].groupby(season, observed=True).agg(['mean', 'min', 'max'])
+    return {str(name): {var: [round(float(row[(var, stat)]), 1) for stat in ('mean', 'min', 'max')]
+                        for var in variables}
+            for name, row in stats.iterrows()}
+
+
+def _extremes(df, variables, top_k, station_col):
+    """各要素的最大值（温度另取最小值）及其日期、站点"""
+    extremes = {}
+    for var in variables:
+        directions = [('max', False), ('min', True)] if var == 'temperature' else [('max', False)]
+        for label, ascending in directions:
+            rows = df.nsmallest(top_k, var) if ascending else df.nlargest(top_k, var)
+            extremes[f'{var}_{label}'] = [
+                (row['date'].strftime('%Y-%m-%d'), round(float(row[var]), 1),
+                 str(row[station_col]) if station_col in df.columns else None)
+                for _, row in rows.iterrows()
+            ]
+    return extremes
+
+
+def _trends(df, variables):
+    """各要素对时间的线性趋势（每年变化量）"""
+    years = ((df['date'] - df['date'].min()) / pd.Timedelta(days=1)).to_numpy(dtype=float) / 365.25
+    if np.ptp(years) == 0:
+        return {}
+    trends = {}
+    for var in variables:
+        values = df[var].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        if valid.sum() > 1:
+            trends[var] = round(float(np.polyfit(years[valid], values[valid], 1)[0]), 3)
+    return trends
+
+
+def _anomaly_clusters(df, anomalies_df, variables, max_clusters, max_gap_days):
+    """
+    把日期间隔不超过 max_gap_days 的异常点合并为一个异常事件，返回规模最大的若干个事件，
+    每个事件给出起止日期、异常点数和偏离最显著的要素（以标准差为单位）
+    """
+    if anomalies_df.empty:
+        return []
+    anomalies = anomalies_df.sort_values('date')
+    dates = anomalies['date'].dt.floor('D')
+    cluster_ids = (dates.diff().dt.days.fillna(0) > max_gap_days).cumsum().to_numpy()
+
+    mean = df[variables].mean()
+    std = df[variables].std().replace(0, np.nan)
+    z = ((anomalies[variables] - mean) / std).fillna(0)
+
+    clusters = []
+    for _, index in pd.Series(np.arange(len(anomalies))).groupby(cluster_ids):
+        members = z.iloc[index.to_numpy()]
+        mean_z = members.mean()
+        dominant = mean_z.abs().idxmax()
+        clusters.append({
+            'start': dates.iloc[index.iloc[0]].strftime('%Y-%m-%d'),
+            'end': dates.iloc[index.iloc[-1]].strftime('%Y-%m-%d'),
+            'count': int(len(members)),
+            'dominant': dominant,
+            'z': round(float(mean_z[dominant]), 1),
+        })
+    clusters.sort(key=lambda cluster: (-cluster['count'], -abs(cluster['z'])))
+    return clusters[:max_clusters]
+
+
+def build_digest(df, anomalies_df=None, top_k=3, max_clusters=5, max_gap_days=3, station_col='station_id'):
+    """
+    构建固定大小的数据摘要
+    :param df: 输入的DataFrame（包含 date 和观测要素列）
+    :param anomalies_df: 异常检测结果中的异常行，None 表示不包含异常信息
+    :param top_k: 每个要素保留的极值个数
+    :param max_clusters: 最多保留的异常事件个数
+    :param max_gap_days: 同一异常事件内相邻异常点的最大间隔（天）
+    :return: 摘要字典
+    """
+    variables = [var for var in MEASUREMENTS if var in df.columns]
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df = df.assign(date=pd.to_datetime(df['date']))
+    anomalies_df = anomalies_df if anomalies_df is not None else pd.DataFrame()
+    return {
+        'period': (df['date'].min().strftime('%Y-%m-%d'), df['date'].max().strftime('%Y-%m-%d')),
+        'rows': int(len(df)),
+        'stations': int(df[station_col].nunique()) if station_col in df.columns else 1,
+        'season_stats': _season_stats(df, variables),
+        'extremes': _extremes(df, variables, top_k, station_col),
+        'trends_per_year': _trends(df, variables),
+        'anomalies': int(len(anomalies_df)),
+        'anomaly_clusters': _anomaly_clusters(df, anomalies_df, variables, max_clusters, max_gap_days)
+        if not anomalies_df.empty else [],
+    }
+
+
+def format_digest(digest):
+    """把摘要字典格式化为紧凑的多行文本，用于拼接 prompt"""
+    lines = [f"时间范围: {digest['period'][0]} ~ {digest['period'][1]}，"
+             f"{digest['rows']} 条记录，{digest['stations']} 个站点"]
+
+    lines.append("分季节统计（均值/最小/最大）:")
+    for season, stats in digest['season_stats'].items():
+        parts = [f"{VARIABLE_NAMES[var]} {'/'.join(str(v) for v in values)}{VARIABLE_UNITS[var]}"
+                 for var, values in stats.items()]
+        lines.append(f"- {season}: " + "，".join(parts))
+
+    lines.append("极值:")
+    for key, items in digest['extremes'].items():
+        var, label = key.rsplit('_', 1)
+        values = "；".join(f"{date} {value}{VARIABLE_UNITS[var]}" + (f"（{station}）" if station else "")
+                          for date, value, station in items)
+        lines.append(f"- {VARIABLE_NAMES[var]}{'最高' if label == 'max' else '最低'}: {values}")
+
+    if digest['trends_per_year']:
+        lines.append("线性趋势（每年）: " + "，".join(
+            f"{VARIABLE_NAMES[var]} {slope:+}{VARIABLE_UNITS[var]}" for var, slope in digest['trends_per_year'].items()))
+
+    lines.append(f"异常点: 共 {digest['anomalies']} 个")
+    for cluster in digest['anomaly_clusters']:
+        lines.append(f"- {cluster['start']} ~ {cluster['end']}: {cluster['count']} 个异常点，"
+                     f"主要表现为{VARIABLE_NAMES[cluster['dominant']]}偏{'高' if cluster['z'] > 0 else '低'} "
+                     f"{abs(cluster['z'])} 个标准差")
+    return "\n".join(lines)
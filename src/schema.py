@@ -0,0 +1,99 @@
+"""
+紧凑数据模式模块
+负责人：Person 2 (2001wzh)
+功能：把气象数据转换为紧凑的内存表示（float32 观测值、分类季节、字典编码站点ID），
+     可选地以放大10倍的 int16 整数（0.1°C、0.1mm、0.1%）落盘，并统计内存占用
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from features import MEASUREMENTS, SEASON_DTYPE
+except ImportError:  # 以 src.schema 方式导入时
+    from .features import MEASUREMENTS, SEASON_DTYPE
+
+COMPACT_MODES = ('float32', 'int16')
+# int16 落盘时的放大倍数及列名后缀
+SCALE = 10
+SCALED_SUFFIX = '_tenths'
+INT16_LIMIT = np.iinfo(np.int16).max
+
+
+def compact_frame(df, inplace=False, station_col='station_id'):
+    """
+    转换为紧凑的内存表示：观测值 float32、季节为有序分类、站点ID字典编码（分类类型）、日期为 datetime64
+    :param inplace: 是否直接修改 df
+    :return: 转换后的DataFrame
+    """
+    if not inplace:
+        df = df.copy()
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'])
+    for column in MEASUREMENTS:
+        if column in df.columns and df[column].dtype != np.float32:
+            df[column] = df[column].astype(np.float32)
+    if 'season' in df.columns and df['season'].dtype != SEASON_DTYPE:
+        df['season'] = pd.Categorical(df['season'], dtype=SEASON_DTYPE)
+    if station_col in df.columns and not isinstance(df[station_col].dtype, pd.CategoricalDtype):
+        df[station_col] = df[station_col].astype('category')
+    return df
+
+
+def encode_scaled(df):
+    """
+    把观测值编码为放大10倍的 int16 列（列名加 _tenths 后缀），用于落盘。
+    取值超出 int16 范围的列保持原样；缺失值使用可空整数类型保存。
+    :return: 编码后的新DataFrame（不修改 df）
+    """
+    encoded = {}
+    for column in df.columns:
+        values = df[column]
+        if column in MEASUREMENTS and pd.api.types.is_float_dtype(values):
+            scaled = np.round(values.to_numpy(dtype=np.float64) * SCALE)
+            if np.nanmax(np.abs(scaled), initial=0) <= INT16_LIMIT:
+                dtype = 'Int16' if np.isnan(scaled).any() else np.int16
+                encoded[column + SCALED_SUFFIX] = pd.Series(scaled, index=df.index).astype(dtype)
+                continue
+        encoded[column] = values
+    return pd.DataFrame(encoded, index=df.index)
+
+
+def decode_scaled(df):
+    """把 encode_scaled 产生的 *_tenths 列还原为 float32 观测值（原地修改并保持列顺序）"""
+    scaled_columns = [column for column in df.columns
+                      if column.endswith(SCALED_SUFFIX) and column[:-len(SCALED_SUFFIX)] in MEASUREMENTS]
+    if not scaled_columns:
+        return df
+    for column in scaled_columns:
+        values = df[column].to_numpy(dtype=np.float32, na_value=np.nan)
+        df[column] = values / np.float32(SCALE)
+    return df.rename(columns={column: column[:-len(SCALED_SUFFIX)] for column in scaled_columns})
+
+
+def scaled_columns(columns, stored_columns=None):
+    """
+    把要读取的观测值列名映射为落盘时的 *_tenths 列名
+    :param stored_columns: 文件中实际保存的列名。取值超出 int16 范围的列以原列名保存，不做映射；
+                           None 表示所有观测值列都已放大保存
+    """
+    if columns is None:
+        return None
+
+    def stored_name(column):
+        if column not in MEASUREMENTS:
+            return column
+        scaled = column + SCALED_SUFFIX
+        return scaled if stored_columns is None or scaled in stored_columns else column
+    return [stored_name(column) for column in columns]
+
+
+def memory_footprint(df):
+    """
+    统计DataFrame的内存占用
+    :return: 包含 columns（各列的类型和字节数）、total_bytes、total_mb 的字典
+    """
+    usage = df.memory_usage(deep=True, index=True)
+    columns = {column: {'dtype': str(df[column].dtype), 'bytes': int(usage[column])} for column in df.columns}
+    total = int(usage.sum())
+    return {'columns': columns, 'total_bytes': total, 'total_mb': round(total / 1024 ** 2, 2)}
@@ -0,0 +1,179 @@
+"""
+共享数据集模块
+负责人：Person 2 (2001wzh)
+功能：进程内共享的只读数据集注册表。每个数据集只以未压缩的 Arrow IPC 文件落盘一次，
+     所有会话拿到的是同一个内存映射的DataFrame（数值列零拷贝、只读），内存占用不随并发用户数增长
+"""
+
+import atexit
+import hashlib
+import importlib.util
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from storage import get_storage
+except ImportError:  # 以 src.shared_store 方式导入时
+    from .storage import get_storage
+
+
+class SharedDatasetStore:
+    """
+    按数据集标识共享的只读数据集注册表（线程安全）。
+    get_or_create 对同一个标识只构建一次数据集；返回的DataFrame由所有调用方共享，
+    其数值列直接引用内存映射的文件内容，原地修改会抛出 ValueError，调用方需要修改时应先复制。
+    会话各自的筛选结果是对共享数据集的切片或取行，不影响其他会话。
+    未安装 pyarrow 时退化为在内存中共享同一个DataFrame。
+    """
+
+    def __init__(self, directory=None, max_entries=8, memory_map=None, ttl=None):
+        """
+        :param directory: Arrow 文件目录；None 表示使用进程退出时自动删除的临时目录。
+                          指定目录时，已存在的同名文件会被直接映射复用，数据集标识必须能唯一确定数据内容。
+        :param max_entries: 注册表中最多保留的数据集个数，超出后移除最久未使用的数据集
+                            （已取得该数据集的会话不受影响）。
+        :param memory_map: 是否使用内存映射的 Arrow 文件，None 表示安装了 pyarrow 时使用。
+        :param ttl: 数据集的有效期（秒），过期后视为未注册，get_or_create 重新构建；None 表示不过期。
+                    指定目录时超过有效期的文件也不再复用。
+        """
+        if memory_map is None:
+            memory_map = importlib.util.find_spec('pyarrow') is not None
+        self.memory_map = memory_map
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.owns_directory = directory is None
+        self.directory = tempfile.mkdtemp(prefix='weather_shared_') if directory is None else directory
+        if self.memory_map:
+            os.makedirs(self.directory, exist_ok=True)
+            self._storage = get_storage('feather')
+        if self.owns_directory:
+            atexit.register(shutil.rmtree, self.directory, True)
+        self._datasets = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}{self._storage.suffix}")
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def keys(self):
+        """已注册的数据集标识（从最久未使用到最近使用）"""
+        with self._lock:
+            return list(self._datasets)
+
+    def get(self, key):
+        """
+        获取已注册的数据集
+        :return: 共享的只读DataFrame，未注册时返回 None
+        """
+        with self._lock:
+            data = self._lookup(key)
+            if data is not None:
+                self._datasets.move_to_end(key)
+            return data
+
+    def _lookup(self, key):
+        """查找未过期的数据集，已过期的移出注册表（调用方需持有 _lock）"""
+        item = self._datasets.get(key)
+        if item is None:
+            return None
+        data, registered = item
+        if self.ttl is not None and time.monotonic() - registered >= self.ttl:
+            del self._datasets[key]
+            if self.owns_directory:
+                self._remove_file(key)
+            return None
+        return data
+
+    def put(self, key, data):
+        """
+        注册数据集（落盘为 Arrow 文件并重新映射）
+        :return: 共享的只读DataFrame，调用方应改用返回值而不是传入的 data
+        """
+        if self.memory_map:
+            path = self._path(key)
+            # 先写临时文件再原子替换，其他进程不会映射到写了一半的文件
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            self._storage.save(data, temp_path)
+            os.replace(temp_path, path)
+            data = self._storage.load(path)
+        self._register(key, data)
+        return data
+
+    def get_or_create(self, key, factory):
+        """
+        获取数据集，不存在时调用 factory() 构建并注册（并发调用时只构建一次）
+        :param key: 数据集标识，如 'sample:2023-01-01:2023-12-31'
+        :param factory: 无参数函数，返回要注册的DataFrame
+        :return: 共享的只读DataFrame
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            data = self.get(key)
+            if data is not None:
+                return data
+            # 指定目录时复用其他进程（或上次运行）已写好的文件
+            if self.memory_map and not self.owns_directory and self._is_fresh(self._path(key)):
+                data = self._storage.load(self._path(key))
+                self._register(key, data)
+                return data
+            return self.put(key, factory())
+
+    def _is_fresh(self, path):
+        """指定目录中的文件是否存在且未超过有效期"""
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return False
+        return self.ttl is None or time.time() - modified < self.ttl
+
+    def _register(self, key, data):
+        with self._lock:
+            self._datasets[key] = (data, time.monotonic())
+            self._datasets.move_to_end(key)
+            while len(self._datasets) > self.max_entries:
+                evicted, _ = self._datasets.popitem(last=False)
+                # 指定目录中的文件可能被其他进程复用，只删除自己临时目录中的文件
+                if self.owns_directory:
+                    self._remove_file(evicted)
+
+    def evict(self, key):
+        """移除数据集（如需要重新生成时），已取得该数据集的会话不受影响"""
+        with self._lock:
+            self._datasets.pop(key, None)
+            self._remove_file(key)
+
+    def _remove_file(self, key):
+        if not self.memory_map:
+            return
+        try:
+            # 已映射的文件在 POSIX 系统上删除后映射仍然有效；Windows 下删除失败时保留文件
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def summary(self):
+        """
+        各数据集的行数和文件大小
+        :return: {数据集标识: {'rows': 行数, 'file_mb': 文件大小MB}}
+        """
+        with self._lock:
+            items = list(self._datasets.items())
+        summary = {}
+        for key, (data, _) in items:
+            path = self._path(key) if self.memory_map else None
+            size = os.path.getsize(path) if path and os.path.exists(path) else 0
+            summary[key] = {'rows': len(data), 'file_mb': round(size / 1024 ** 2, 2)}
+        return summary
@@ -0,0 +1,178 @@
+"""
+数据存储模块
+负责人：Person 2 (2001wzh)
+功能：为原始数据和处理后数据提供可插拔的存储后端（CSV、Parquet、Feather、内存映射列文件）
+"""
+
+import pandas as pd
+
+try:
+    from memmap_store import SUFFIX as MEMMAP_SUFFIX, MemmapDataset, write_memmap
+except ImportError:  # 以 src.storage 方式导入时
+    from .memmap_store import SUFFIX as MEMMAP_SUFFIX, MemmapDataset, write_memmap
+
+
+def _require_pyarrow():
+    """按需导入pyarrow，未安装时给出明确提示"""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Parquet/Feather 存储需要安装 pyarrow：pip install pyarrow") from e
+    return pyarrow
+
+
+def to_arrow_table(df):
+    """
+    转换为 Arrow 表。浮点列中的 NaN 保留为 NaN 而不是转换为 null，
+    没有 null 的数值列在内存映射读取时才能零拷贝地转换回 pandas。
+    """
+    pa = _require_pyarrow()
+    df = df.reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type) and table.column(i).null_count:
+            table = table.set_column(i, field, pa.array(df[field.name].to_numpy(), from_pandas=False))
+    return table
+
+
+def _with_date_column(columns, start_date, end_date):
+    """按日期过滤时需要额外读取 date 列"""
+    if columns is None or 'date' in columns or (start_date is None and end_date is None):
+        return columns
+    return list(columns) + ['date']
+
+
+def _filter_date_range(df, start_date=None, end_date=None):
+    """在内存中按日期范围过滤（用于不支持谓词下推的格式）"""
+    if start_date is not None:
+        df = df[df['date'] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        df = df[df['date'] <= pd.Timestamp(end_date)]
+    return df
+
+
+class CSVStorage:
+    """CSV文本存储（默认格式，兼容性最好）"""
+
+    suffix = '.csv'
+
+    def save(self, df, path):
+        df.to_csv(path, index=False)
+
+    def columns(self, path):
+        """文件中保存的列名（只读表头）"""
+        return list(pd.read_csv(path, nrows=0).columns)
+
+    def load(self, path, columns=None, start_date=None, end_date=None):
+        read_columns = _with_date_column(columns, start_date, end_date)
+        header = pd.read_csv(path, nrows=0).columns
+        parse_dates = ['date'] if 'date' in header and (read_columns is None or 'date' in read_columns) else None
+        df = pd.read_csv(path, usecols=read_columns, parse_dates=parse_dates)
+        df = _filter_date_range(df, start_date, end_date)
+        return df[columns] if columns is not None else df
+
+
+class ParquetStorage:
+    """压缩的Parquet列式存储，支持列裁剪和按日期范围的谓词下推"""
+
+    suffix = '.parquet'
+
+    def __init__(self, compression='zstd', row_group_size=100_000):
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def save(self, df, path):
+        pa = _require_pyarrow()
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, path, compression=self.compression, row_group_size=self.row_group_size)
+
+    def columns(self, path):
+        """文件中保存的列名（只读元数据）"""
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+
+    def load(self, path, columns=None, start_date=None, end_date=None):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        filters = []
+        if start_date is not None:
+            filters.append(('date', '>=', pd.Timestamp(start_date)))
+        if end_date is not None:
+            filters.append(('date', '<=', pd.Timestamp(end_date)))
+        # 行组统计信息使不在日期范围内的行组直接被跳过
+        table = pq.read_table(path, columns=columns, filters=filters or None)
+        return table.to_pandas()
+
+
+class FeatherStorage:
+    """未压缩的Feather(Arrow IPC)存储，通过内存映射实现零拷贝的热加载"""
+
+    suffix = '.feather'
+
+    def save(self, df, path):
+        _require_pyarrow()
+        import pyarrow.feather as feather
+        feather.write_feather(to_arrow_table(df), path, compression='uncompressed')
+
+    def columns(self, path):
+        """文件中保存的列名（只读文件头）"""
+        pa = _require_pyarrow()
+        with pa.memory_map(path) as source:
+            return list(pa.ipc.open_file(source).schema.names)
+
+    def load(self, path, columns=None, start_date=None, end_date=None):
+        _require_pyarrow()
+        import pyarrow.compute as pc
+        import pyarrow.feather as feather
+        read_columns = _with_date_column(columns, start_date, end_date)
+        table = feather.read_table(path, columns=read_columns, memory_map=True)
+        if start_date is not None or end_date is not None:
+            mask = None
+            if start_date is not None:
+                mask = pc.greater_equal(table['date'], pd.Timestamp(start_date))
+            if end_date is not None:
+                upper = pc.less_equal(table['date'], pd.Timestamp(end_date))
+                mask = upper if mask is None else pc.and_(mask, upper)
+            table = table.filter(mask)
+        if columns is not None:
+            table = table.select(columns)
+        # split_blocks 避免合并成二维块，无缺失值的数值列可直接复用映射内存
+        return table.to_pandas(split_blocks=True)
+
+
+class MemmapStorage:
+    """按列的 NumPy 内存映射文件 + 站点/日期偏移索引，按日期范围读取时只访问对应的页（不依赖 pyarrow）"""
+
+    suffix = MEMMAP_SUFFIX
+
+    def save(self, df, path):
+        write_memmap(df, path)
+
+    def columns(self, path):
+        """数据集中保存的列名（只读元数据）"""
+        return MemmapDataset(path).columns
+
+    def load(self, path, columns=None, start_date=None, end_date=None):
+        """按精确时间戳过滤；返回的行按（站点, 日期）排列，而不是保存时的输入顺序"""
+        return MemmapDataset(path).slice(start_date, end_date, columns=columns)
+
+
+STORAGE_BACKENDS = {
+    'csv': CSVStorage,
+    'parquet': ParquetStorage,
+    'feather': FeatherStorage,
+    'memmap': MemmapStorage,
+}
+
+
+def get_storage(storage_format='csv', **kwargs):
+    """
+    根据格式名称创建存储后端
+    :param storage_format: 'csv'、'parquet'、'feather' 或 'memmap'
+    :return: 存储后端实例
+    """
+    if storage_format not in STORAGE_BACKENDS:
+        raise ValueError(f"不支持的存储格式: {storage_format}，可选: {list(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[storage_format](**kwargs)
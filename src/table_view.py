@@ -0,0 +1,101 @@
+"""
+表格分页与导出模块
+负责人：Person 3 (可视化工程师)
+功能：为大数据集提供按页取数的可排序表格视图（每次只物化当前页的行），
+     以及按块写出的 gzip 压缩 CSV / Parquet 导出，导出时内存占用与块大小而不是数据量相关
+"""
+
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = (20, 50, 100, 500)
+EXPORT_CHUNK_ROWS = 100_000
+EXPORT_FORMATS = {
+    'csv.gz': ('CSV (gzip压缩)', 'application/gzip'),
+    'parquet': ('Parquet (zstd压缩)', 'application/vnd.apache.parquet'),
+}
+
+
+def page_count(n_rows, page_size):
+    """总页数（空数据也至少有一页）"""
+    return max(1, -(-n_rows // page_size))
+
+
+def sort_order(values, ascending=True):
+    """
+    排序后的行位置（稳定排序，缺失值排在最后）
+    :param values: 排序列（Series 或数组），支持数值、日期、字符串和分类类型
+    :return: int64 位置数组
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last')
+    return ordered.index.to_numpy(dtype=np.int64)
+
+
+def is_presorted(values, ascending=True):
+    """数据是否已按该列有序（如按日期排列的数据按日期排序时无需计算排序）"""
+    values = pd.Series(values)
+    if values.hasnans:
+        return False
+    return values.is_monotonic_increasing if ascending else values.is_monotonic_decreasing
+
+
+def page_slice(data, page, page_size, order=None):
+    """
+    取出一页数据
+    :param page: 页码（从 1 开始，超出范围时取最后一页）
+    :param order: sort_order 返回的位置数组，None 表示按原顺序
+    :return: 当前页的DataFrame
+    """
+    page = min(max(1, page), page_count(len(data), page_size))
+    start, stop = (page - 1) * page_size, page * page_size
+    if order is None:
+        return data.iloc[start:stop]
+    return data.take(order[start:stop])
+
+
+def _iter_chunks(data, chunk_rows):
+    for start in range(0, len(data), chunk_rows):
+        yield data.iloc[start:start + chunk_rows]
+
+
+def write_csv_gzip(data, fileobj, chunk_rows=EXPORT_CHUNK_ROWS):
+    """按块把数据写成 gzip 压缩的 CSV（UTF-8，带表头）"""
+    with gzip.GzipFile(fileobj=fileobj, mode='wb') as gz, \
+            io.TextIOWrapper(gz, encoding='utf-8', newline='') as text:
+        for i, chunk in enumerate(_iter_chunks(data, chunk_rows)):
+            chunk.to_csv(text, index=False, header=(i == 0))
+        if len(data) == 0:
+            data.to_csv(text, index=False)
+
+
+def write_parquet(data, fileobj, chunk_rows=EXPORT_CHUNK_ROWS, compression='zstd'):
+    """按块把数据写成 Parquet，每块一个 row group（需要 pyarrow）"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet 导出需要安装 pyarrow：pip install pyarrow") from e
+    schema = pa.Schema.from_pandas(data.iloc[:chunk_rows], preserve_index=False)
+    with pq.ParquetWriter(fileobj, schema, compression=compression) as writer:
+        for chunk in _iter_chunks(data, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def export_bytes(data, fmt='csv.gz', chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    生成导出文件内容
+    :param fmt: 'csv.gz' 或 'parquet'
+    :return: 压缩后的文件字节
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}，可选: {list(EXPORT_FORMATS)}")
+    buffer = io.BytesIO()
+    if fmt == 'csv.gz':
+        write_csv_gzip(data, buffer, chunk_rows)
+    else:
+        write_parquet(data, buffer, chunk_rows)
+    return buffer.getvalue()
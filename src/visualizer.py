@@ -4,45 +4,126 @@
 功能：生成各种气象数据可视化图表
 """
 
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
-plt.rcParams['axes.unicode_minus'] = False
+try:
+    from downsampling import DEFAULT_MAX_POINTS, downsample, binned_histogram
+    from figure_cache import FigureCache
+    from aggregates import AggregateCube
+except ImportError:  # 以 src.visualizer 方式导入时
+    from .downsampling import DEFAULT_MAX_POINTS, downsample, binned_histogram
+    from .figure_cache import FigureCache
+    from .aggregates import AggregateCube
+
+_FONT_CONFIGURED = False
+
+# 各静态图表实际使用的列，只有这些列变化时图表缓存才失效
+FIGURE_COLUMNS = {
+    'temperature_trend': ['date', 'temperature'],
+    'seasonal_comparison': ['season', 'temperature', 'humidity', 'precipitation', 'wind_speed'],
+    'correlation_heatmap': ['temperature', 'humidity', 'precipitation', 'wind_speed'],
+    'weather_patterns': ['date', 'temperature', 'humidity', 'precipitation', 'wind_speed'],
+}
+
+
+def _pyplot():
+    """
+    按需导入 matplotlib.pyplot，并在第一次使用时设置中文字体。
+    Matplotlib/Seaborn/Plotly 都在实际绘图时才导入，导入本模块不会加载这些库，也不会修改全局 rcParams。
+    """
+    global _FONT_CONFIGURED
+    import matplotlib.pyplot as plt
+    if not _FONT_CONFIGURED:
+        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
+        plt.rcParams['axes.unicode_minus'] = False
+        _FONT_CONFIGURED = True
+    return plt
 
 class WeatherVisualizer:
     """气象数据可视化类"""
     
-    def __init__(self):
-        """初始化可视化器"""
+    def __init__(self, figure_cache=None):
+        """
+        初始化可视化器
+        
+        Args:
+            figure_cache: (可选) FigureCache 实例，输入数据和参数未变化时直接复用已渲染的静态图表
+        """
         self.color_palette = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
+        self.figure_cache = figure_cache
+    
+    def _cache_key(self, plot_name, data, **params):
+        """图表缓存键，未启用缓存时为 None"""
+        if self.figure_cache is None:
+            return None
+        return self.figure_cache.make_key(data, FIGURE_COLUMNS[plot_name], plot=plot_name,
+                                          palette=tuple(self.color_palette), **params)
+    
+    def _fetch_cached(self, plot_name, data, save_path, **params):
+        """
+        查询图表缓存，命中时图表已被复制到 save_path
         
-    def plot_temperature_trend(self, data, save_path=None):
+        Returns:
+            (是否命中, 缓存键)；未启用缓存或不保存文件时缓存键为 None
+        """
+        if self.figure_cache is None or not save_path:
+            return False, None
+        key = self._cache_key(plot_name, data, **params)
+        return self.figure_cache.fetch(key, save_path), key
+    
+    def _show_cached(self, save_path, show):
+        """
+        显示缓存命中时复用的图表（交互/Notebook 环境下与重新绘制时一样调用 plt.show()）
+        
+        Args:
+            save_path: 已复制到的图表路径
+            show: 为 False 时不做任何事
+        """
+        if not show:
+            return
+        plt = _pyplot()
+        image = plt.imread(save_path)
+        # 图表以 300dpi 保存，按原始尺寸显示
+        fig = plt.figure(figsize=(image.shape[1] / 300, image.shape[0] / 300))
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.imshow(image)
+        ax.axis('off')
+        plt.show()
+        
+    def plot_temperature_trend(self, data, save_path=None, max_points=DEFAULT_MAX_POINTS, show=True):
         """
         绘制温度趋势图
         
         Args:
             data: 包含日期和温度的DataFrame
             save_path: 保存路径
+            max_points: 绘图点数预算，超出时先做LTTB降采样（None 表示绘制全部点）
+            show: 是否调用 plt.show()；为 False 时绘制完成后关闭图形（批量/无界面模式）
         """
+        hit, cache_key = self._fetch_cached('temperature_trend', data, save_path, max_points=max_points)
+        if hit:
+            print(f"温度趋势图未变化，已复用缓存: {save_path}")
+            self._show_cached(save_path, show)
+            return
+        
+        plt = _pyplot()
+        
         plt.figure(figsize=(12, 6))
         
+        # 添加移动平均线（在完整数据上计算，再与温度一起降采样；已由 derive_features 计算时直接复用）
+        if 'temp_ma7' not in data.columns:
+            data = data.assign(temp_ma7=data['temperature'].rolling(window=7).mean())
+        plot_data = downsample(data, 'date', 'temperature', max_points)
+        
         # 绘制温度趋势
-        plt.plot(data['date'], data['temperature'], 
+        plt.plot(plot_data['date'], plot_data['temperature'], 
                 color=self.color_palette[0], linewidth=2, alpha=0.8)
         
-        # 添加移动平均线
-        data['temp_ma7'] = data['temperature'].rolling(window=7).mean()
-        plt.plot(data['date'], data['temp_ma7'], 
+        plt.plot(plot_data['date'], plot_data['temp_ma7'], 
                 color=self.color_palette[1], linewidth=2, 
                 label='7天移动平均', alpha=0.7)
         
@@ -57,17 +138,32 @@ class WeatherVisualizer:
         if save_path:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"温度趋势图已保存到: {save_path}")
+            if cache_key:
+                self.figure_cache.store(cache_key, save_path)
         
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close()
         
-    def plot_seasonal_comparison(self, data, save_path=None):
+    def plot_seasonal_comparison(self, data, save_path=None, show=True):
         """
         绘制季节对比箱线图
         
         Args:
             data: 包含季节和气象数据的DataFrame
             save_path: 保存路径
+            show: 是否调用 plt.show()；为 False 时绘制完成后关闭图形（批量/无界面模式）
         """
+        hit, cache_key = self._fetch_cached('seasonal_comparison', data, save_path)
+        if hit:
+            print(f"季节对比图未变化，已复用缓存: {save_path}")
+            self._show_cached(save_path, show)
+            return
+        
+        plt = _pyplot()
+        import seaborn as sns
+        
         fig, axes = plt.subplots(2, 2, figsize=(15, 10))
         
         # 温度对比
@@ -103,17 +199,32 @@ class WeatherVisualizer:
         if save_path:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"季节对比图已保存到: {save_path}")
+            if cache_key:
+                self.figure_cache.store(cache_key, save_path)
         
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close()
         
-    def plot_correlation_heatmap(self, data, save_path=None):
+    def plot_correlation_heatmap(self, data, save_path=None, show=True):
         """
         绘制相关性热力图
         
         Args:
             data: 气象数据DataFrame
             save_path: 保存路径
+            show: 是否调用 plt.show()；为 False 时绘制完成后关闭图形（批量/无界面模式）
         """
+        hit, cache_key = self._fetch_cached('correlation_heatmap', data, save_path)
+        if hit:
+            print(f"相关性热力图未变化，已复用缓存: {save_path}")
+            self._show_cached(save_path, show)
+            return
+        
+        plt = _pyplot()
+        import seaborn as sns
+        
         # 选择数值列
         numeric_cols = ['temperature', 'humidity', 'precipitation', 'wind_speed']
         correlation_matrix = data[numeric_cols].corr()
@@ -143,19 +254,37 @@ class WeatherVisualizer:
         if save_path:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"相关性热力图已保存到: {save_path}")
+            if cache_key:
+                self.figure_cache.store(cache_key, save_path)
         
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close()
         
-    def create_interactive_dashboard(self, data):
+    def create_interactive_dashboard(self, data, max_points=DEFAULT_MAX_POINTS, cube=None):
         """
         创建交互式仪表板
         
         Args:
             data: 气象数据DataFrame
+            max_points: 每条时间序列的点数预算，超出时先降采样（None 表示绘制全部点）
+            cube: (可选) 由 data 构建的 AggregateCube，季节统计直接由其汇总而不再扫描原始数据
             
         Returns:
             plotly图表对象
         """
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        
+        temp_data = downsample(data, 'date', 'temperature', max_points)
+        wind_data = downsample(data, 'date', 'wind_speed', max_points, method='minmax')
+        humidity_centers, humidity_counts, humidity_widths = binned_histogram(data['humidity'])
+        if cube is not None:
+            seasonal_precip = cube.rollup('season', 'precipitation')['mean']
+        else:
+            seasonal_precip = data.groupby('season', observed=True)['precipitation'].mean()
+        
         # 创建子图
         fig = make_subplots(
             rows=2, cols=2,
@@ -166,24 +295,25 @@ class WeatherVisualizer:
         
         # 温度趋势
         fig.add_trace(
-            go.Scatter(x=data['date'], y=data['temperature'],
+            go.Scatter(x=temp_data['date'], y=temp_data['temperature'],
                       mode='lines', name='温度',
                       line=dict(color=self.color_palette[0], width=2)),
             row=1, col=1
         )
         
-        # 湿度分布
+        # 湿度分布（预先分箱，只传输各分箱的计数）
         fig.add_trace(
-            go.Histogram(x=data['humidity'], name='湿度分布',
-                        marker_color=self.color_palette[1],
-                        opacity=0.7),
+            go.Bar(x=humidity_centers, y=humidity_counts, width=humidity_widths,
+                   name='湿度分布',
+                   marker_color=self.color_palette[1],
+                   opacity=0.7),
             row=1, col=2
         )
         
         # 降水量分析
         fig.add_trace(
-            go.Bar(x=data.groupby('season')['precipitation'].mean().index,
-                  y=data.groupby('season')['precipitation'].mean().values,
+            go.Bar(x=seasonal_precip.index,
+                  y=seasonal_precip.values,
                   name='平均降水量',
                   marker_color=self.color_palette[2]),
             row=2, col=1
@@ -191,7 +321,7 @@ class WeatherVisualizer:
         
         # 风速变化
         fig.add_trace(
-            go.Scatter(x=data['date'], y=data['wind_speed'],
+            go.Scatter(x=wind_data['date'], y=wind_data['wind_speed'],
                       mode='markers', name='风速',
                       marker=dict(color=self.color_palette[3], size=4)),
             row=2, col=2
@@ -220,14 +350,24 @@ class WeatherVisualizer:
         
         return fig
         
-    def plot_weather_patterns(self, data, save_path=None):
+    def plot_weather_patterns(self, data, save_path=None, show=True, cube=None):
         """
         绘制天气模式分析图
         
         Args:
             data: 气象数据DataFrame
             save_path: 保存路径
+            show: 是否调用 plt.show()；为 False 时绘制完成后关闭图形（批量/无界面模式）
+            cube: (可选) 由 data 构建的 AggregateCube，月度统计直接由其汇总而不再扫描原始数据
         """
+        hit, cache_key = self._fetch_cached('weather_patterns', data, save_path)
+        if hit:
+            print(f"天气模式分析图未变化，已复用缓存: {save_path}")
+            self._show_cached(save_path, show)
+            return
+        
+        plt = _pyplot()
+        
         fig, axes = plt.subplots(2, 2, figsize=(15, 10))
         
         # 温度-湿度散点图
@@ -240,7 +380,11 @@ class WeatherVisualizer:
         plt.colorbar(scatter, ax=axes[0,0], label='降水量 (mm)')
         
         # 月度平均温度
-        monthly_temp = data.groupby(data['date'].dt.month)['temperature'].mean()
+        if cube is not None:
+            monthly_temp = cube.rollup('month', 'temperature')['mean']
+        else:
+            month = data['month'] if 'month' in data.columns else data['date'].dt.month
+            monthly_temp = data.groupby(month)['temperature'].mean()
         axes[0,1].plot(monthly_temp.index, monthly_temp.values, 
                       marker='o', linewidth=2, markersize=6,
                       color=self.color_palette[1])
@@ -268,42 +412,102 @@ class WeatherVisualizer:
         if save_path:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"天气模式分析图已保存到: {save_path}")
+            if cache_key:
+                self.figure_cache.store(cache_key, save_path)
         
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close()
         
-    def generate_all_visualizations(self, data, output_dir='results'):
+    def generate_all_visualizations(self, data, output_dir='results', headless=False, max_workers=None, use_cache=True,
+                                    cube=None):
         """
         生成所有可视化图表
         
         Args:
             data: 气象数据DataFrame
             output_dir: 输出目录
+            headless: 无界面批量模式。使用Agg后端在进程池中并发渲染静态图表，
+                      不调用 plt.show()，适合夜间批量生成报告
+            max_workers: 无界面模式下的进程数，None 表示使用全部CPU核心
+            use_cache: 是否复用未变化的静态图表（未配置 figure_cache 时使用 output_dir/.figure_cache）
+            cube: (可选) 入库/清洗时已构建的 AggregateCube（如 process_csv_in_chunks 返回的 aggregate_cube）；
+                  未提供时只在需要重新渲染天气模式分析图时才构建
+            
+        Returns:
+            图表名称到输出文件路径的字典
         """
         import os
         os.makedirs(output_dir, exist_ok=True)
         
         print("🎨 Person 3 正在生成可视化图表...")
         
-        # 生成各种图表
-        self.plot_temperature_trend(data, f'{output_dir}/temperature_trend.png')
-        self.plot_seasonal_comparison(data, f'{output_dir}/seasonal_comparison.png')
-        self.plot_correlation_heatmap(data, f'{output_dir}/correlation_heatmap.png')
-        self.plot_weather_patterns(data, f'{output_dir}/weather_patterns.png')
-        
-        # 生成交互式仪表板
-        interactive_fig = self.create_interactive_dashboard(data)
-        interactive_fig.write_html(f'{output_dir}/interactive_dashboard.html')
+        paths = {name: f'{output_dir}/{name}.png' for name in STATIC_FIGURES}
+        figure_cache = self.figure_cache
+        if use_cache and figure_cache is None:
+            figure_cache = FigureCache(os.path.join(output_dir, '.figure_cache'))
+        renderer = WeatherVisualizer(figure_cache=figure_cache if use_cache else None)
+        renderer.color_palette = self.color_palette
+        if cube is None:
+            # 天气模式分析图是唯一使用立方体的静态图表，缓存命中时无需扫描原始数据构建立方体；
+            # 此时交互式仪表板直接对季节做一次 groupby
+            patterns_key = renderer._cache_key('weather_patterns', data)
+            if patterns_key is None or not renderer.figure_cache.contains(patterns_key):
+                cube = AggregateCube.build(data)
+        
+        if headless:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_render_static_figure, method_name, data, paths[name],
+                                           renderer.figure_cache, renderer.color_palette,
+                                           **_cube_kwargs(method_name, cube))
+                           for name, method_name in STATIC_FIGURES.items()]
+                # 静态图表在子进程中渲染的同时，主进程生成交互式仪表板
+                interactive_fig = self.create_interactive_dashboard(data, cube=cube)
+                interactive_fig.write_html(f'{output_dir}/interactive_dashboard.html')
+                for future in futures:
+                    future.result()
+        else:
+            # 生成各种图表
+            for name, method_name in STATIC_FIGURES.items():
+                getattr(renderer, method_name)(data, paths[name], **_cube_kwargs(method_name, cube))
+            
+            # 生成交互式仪表板
+            interactive_fig = self.create_interactive_dashboard(data, cube=cube)
+            interactive_fig.write_html(f'{output_dir}/interactive_dashboard.html')
         print(f"交互式仪表板已保存到: {output_dir}/interactive_dashboard.html")
         
         print("✅ Person 3 的可视化模块完成！")
         
-        return {
-            'temperature_trend': f'{output_dir}/temperature_trend.png',
-            'seasonal_comparison': f'{output_dir}/seasonal_comparison.png',
-            'correlation_heatmap': f'{output_dir}/correlation_heatmap.png',
-            'weather_patterns': f'{output_dir}/weather_patterns.png',
-            'interactive_dashboard': f'{output_dir}/interactive_dashboard.html'
-        }
+        paths['interactive_dashboard'] = f'{output_dir}/interactive_dashboard.html'
+        return paths
+
+
+# 静态图表名称与绘图方法的对应关系
+STATIC_FIGURES = {
+    'temperature_trend': 'plot_temperature_trend',
+    'seasonal_comparison': 'plot_seasonal_comparison',
+    'correlation_heatmap': 'plot_correlation_heatmap',
+    'weather_patterns': 'plot_weather_patterns',
+}
+
+# 可以直接使用聚合立方体的绘图方法
+CUBE_FIGURES = {'plot_weather_patterns'}
+
+
+def _cube_kwargs(method_name, cube):
+    return {'cube': cube} if method_name in CUBE_FIGURES else {}
+
+
+def _render_static_figure(method_name, data, save_path, figure_cache=None, color_palette=None, **kwargs):
+    """在子进程中用Agg后端渲染并保存一张静态图表（供进程池调用），color_palette 为主进程可视化器的配色"""
+    _pyplot().switch_backend('Agg')
+    visualizer = WeatherVisualizer(figure_cache=figure_cache)
+    if color_palette is not None:
+        visualizer.color_palette = list(color_palette)
+    getattr(visualizer, method_name)(data, save_path, show=False, **kwargs)
+    return save_path
 
 if __name__ == "__main__":
     # 测试代码